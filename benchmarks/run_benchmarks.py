@@ -0,0 +1,349 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright 2021 Brett D. Roads. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+"""Benchmark suite for tidy_models.
+
+Times the database, utils and multicuda hot paths on synthetic fit logs
+and writes machine-readable results. Results can be compared against a
+previously stored baseline.
+
+Example:
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --baseline bench.json
+
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import tidy_models
+import tidy_models.databases.pandas.core as db
+from tidy_models import multicuda
+from tidy_models.model_identifier import ModelIdentifier
+from tidy_models.utils import collapse_splits
+from tidy_models.utils import select_hypers
+
+from synthetic import make_fit_log
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+
+
+def timeit(fn, n_repeat=5, setup=None):
+    """Time a function.
+
+    Arguments:
+        fn: A function without arguments. If `setup` is provided, `fn`
+            receives the return value of `setup` instead.
+        n_repeat (optional): The number of timed repetitions.
+        setup (optional): A function evaluated before each repetition
+            that is not timed.
+
+    Returns:
+        timing: A dictionary with the minimum and median wall time in
+            seconds.
+
+    """
+    t_list = []
+    for _ in range(n_repeat):
+        if setup is None:
+            t0 = time.perf_counter()
+            fn()
+        else:
+            arg = setup()
+            t0 = time.perf_counter()
+            fn(arg)
+        t_list.append(time.perf_counter() - t0)
+    timing = {
+        'n_repeat': n_repeat,
+        'min_s': min(t_list),
+        'median_s': statistics.median(t_list),
+    }
+    return timing
+
+
+def bench_database(df_fit, dp_tmp, n_repeat):
+    """Benchmark `save_db`, `load_db` and `update_one`."""
+    result_list = []
+    fp = os.path.join(dp_tmp, 'db_fit.txt')
+
+    timing = timeit(lambda: db.save_db(df_fit, fp), n_repeat=n_repeat)
+    result_list.append(('save_db', timing))
+
+    # Bypass the cache so that parsing is timed on every repetition.
+    timing = timeit(lambda: db.load_db(fp, cache=False), n_repeat=n_repeat)
+    result_list.append(('load_db', timing))
+
+    db.load_db(fp)
+    timing = timeit(lambda: db.load_db(fp), n_repeat=n_repeat)
+    result_list.append(('load_db_cached', timing))
+
+    # Update an existing row.
+    row = df_fit.iloc[len(df_fit) // 2]
+    id_data = {
+        k: row[k] for k in df_fit.columns
+        if k in db.ID_COLUMNS or k.startswith(db.HYPER_PREFIX)
+    }
+    timing = timeit(
+        lambda df: db.update_one(df, id_data, {'loss_val': 0.}),
+        n_repeat=n_repeat, setup=df_fit.copy
+    )
+    result_list.append(('update_one_existing', timing))
+
+    # Insert a new row.
+    id_data_new = dict(id_data, arch_id=int(df_fit['arch_id'].max()) + 1)
+    timing = timeit(
+        lambda df: db.update_one(df, id_data_new, {'loss_val': 0.}),
+        n_repeat=n_repeat, setup=df_fit.copy
+    )
+    result_list.append(('update_one_new', timing))
+    return result_list
+
+
+def bench_utils(df_fit, n_repeat):
+    """Benchmark `collapse_splits` and `select_hypers`."""
+    result_list = []
+    id_data = {'arch_id': 0, 'input_id': 0}
+
+    timing = timeit(
+        lambda: collapse_splits(df_fit, id_data), n_repeat=n_repeat
+    )
+    result_list.append(('collapse_splits', timing))
+
+    df_fit_collapse = collapse_splits(df_fit, id_data)
+    timing = timeit(
+        lambda: select_hypers(
+            df_fit_collapse, id_data, monitor_key='loss_val'
+        ),
+        n_repeat=n_repeat
+    )
+    result_list.append(('select_hypers', timing))
+    return result_list
+
+
+def bench_model_identifier(n_repeat, n_call=10000):
+    """Benchmark `ModelIdentifier.name`."""
+    mid = ModelIdentifier(
+        arch_id=3, input_id=1, hypers={'n_dim': 4, 'lr': .001}, split=2
+    )
+
+    def fn():
+        for _ in range(n_call):
+            mid.name
+
+    timing = timeit(fn, n_repeat=n_repeat)
+    return [('model_identifier_name', timing)]
+
+
+def noop_target(**kwargs):
+    """Target that does nothing."""
+    pass
+
+
+def bench_multicuda(n_repeat, n_task=32, n_device=4):
+    """Benchmark `cuda_manager` dispatch overhead with no-op targets."""
+    args_list = [{'id': i} for i in range(n_task)]
+    cuda_id_list = list(range(n_device))
+    timing = timeit(
+        lambda: multicuda.cuda_manager(noop_target, args_list, cuda_id_list),
+        n_repeat=n_repeat
+    )
+    return [('cuda_manager', timing)]
+
+
+def run(
+        sizes=DEFAULT_SIZES, hyper_cardinalities=[8], n_splits=[10],
+        n_repeat=5, include_multicuda=True):
+    """Run the benchmark suite.
+
+    The database and utils benchmarks run for every combination of
+    `sizes`, `hyper_cardinalities` and `n_splits`.
+
+    Arguments:
+        sizes (optional): A list of fit log sizes (number of rows).
+        hyper_cardinalities (optional): A list of hyperparameter
+            cardinalities. See `make_fit_log`.
+        n_splits (optional): A list of split counts. See
+            `make_fit_log`.
+        n_repeat (optional): The number of timed repetitions.
+        include_multicuda (optional): Boolean indicating if the
+            multicuda benchmark should run.
+
+    Returns:
+        report: A dictionary with environment metadata and a list of
+            results.
+
+    """
+    result_list = []
+
+    def add(name, params, timing):
+        result_list.append({'name': name, 'params': params, **timing})
+        print(
+            '{0:<24s} {1:<48s} median={2:.6f}s'.format(
+                name, json.dumps(params, sort_keys=True), timing['median_s']
+            ),
+            flush=True
+        )
+
+    with tempfile.TemporaryDirectory() as dp_tmp:
+        config_list = [
+            (n_row, hyper_cardinality, n_split)
+            for n_row in sizes
+            for hyper_cardinality in hyper_cardinalities
+            for n_split in n_splits
+        ]
+        for n_row, hyper_cardinality, n_split in config_list:
+            df_fit = make_fit_log(
+                n_row, hyper_cardinality=hyper_cardinality, n_split=n_split
+            )
+            params = {
+                'n_row': n_row,
+                'hyper_cardinality': hyper_cardinality,
+                'n_split': n_split,
+            }
+            for name, timing in bench_database(df_fit, dp_tmp, n_repeat):
+                add(name, params, timing)
+            for name, timing in bench_utils(df_fit, n_repeat):
+                add(name, params, timing)
+
+    for name, timing in bench_model_identifier(n_repeat):
+        add(name, {}, timing)
+
+    if include_multicuda:
+        for name, timing in bench_multicuda(n_repeat):
+            add(name, {}, timing)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'tidy_models_path': os.path.dirname(tidy_models.__file__),
+        },
+        'results': result_list,
+    }
+    return report
+
+
+def compare(report, baseline, threshold=1.25):
+    """Compare results against a baseline.
+
+    Arguments:
+        report: A report returned by `run`.
+        baseline: A report loaded from a previous run.
+        threshold (optional): A benchmark regresses if its median time
+            is larger than `threshold` times the baseline median.
+
+    Returns:
+        regression_list: A list of dictionaries describing each
+            regression.
+
+    """
+    def key(r):
+        return (r['name'], json.dumps(r['params'], sort_keys=True))
+
+    baseline_dict = {key(r): r for r in baseline['results']}
+    regression_list = []
+    for r in report['results']:
+        r_base = baseline_dict.get(key(r))
+        if r_base is None:
+            continue
+        ratio = r['median_s'] / max(r_base['median_s'], 1e-12)
+        print(
+            '{0:<24s} {1:<48s} ratio={2:.2f}'.format(
+                r['name'], json.dumps(r['params'], sort_keys=True), ratio
+            )
+        )
+        if ratio > threshold:
+            regression_list.append({
+                'name': r['name'],
+                'params': r['params'],
+                'median_s': r['median_s'],
+                'baseline_median_s': r_base['median_s'],
+                'ratio': ratio,
+            })
+    return regression_list
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+        help='Fit log sizes (number of rows).'
+    )
+    parser.add_argument(
+        '--hyper-cardinalities', type=int, nargs='+', default=[8],
+        help='Number of values of each hyperparameter.'
+    )
+    parser.add_argument(
+        '--n-splits', type=int, nargs='+', default=[10],
+        help='Number of splits.'
+    )
+    parser.add_argument('--n-repeat', type=int, default=5)
+    parser.add_argument(
+        '--skip-multicuda', action='store_true',
+        help='Skip the multicuda dispatch benchmark.'
+    )
+    parser.add_argument(
+        '--output', help='Filepath for writing JSON results.'
+    )
+    parser.add_argument(
+        '--baseline', help='Filepath of JSON results to compare against.'
+    )
+    parser.add_argument(
+        '--threshold', type=float, default=1.25,
+        help='Maximum allowed ratio of median time to baseline.'
+    )
+    args = parser.parse_args(argv)
+
+    report = run(
+        sizes=args.sizes, hyper_cardinalities=args.hyper_cardinalities,
+        n_splits=args.n_splits, n_repeat=args.n_repeat,
+        include_multicuda=not args.skip_multicuda
+    )
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regression_list = compare(report, baseline, args.threshold)
+        for r in regression_list:
+            print(
+                'REGRESSION: {0} {1} {2:.2f}x'.format(
+                    r['name'], json.dumps(r['params'], sort_keys=True),
+                    r['ratio']
+                )
+            )
+        if len(regression_list) > 0:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
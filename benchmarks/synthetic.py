@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Brett D. Roads. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+"""Synthetic fit logs for benchmarks.
+
+Functions:
+    make_fit_log: Create a synthetic fit database.
+
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def make_fit_log(
+        n_row, n_input=2, n_hyper=2, hyper_cardinality=8, n_split=10,
+        seed=252):
+    """Create a synthetic fit database.
+
+    Rows enumerate the Cartesian product of splits, hyperparameter
+    values, inputs and architectures (in that order of fastest
+    variation), adding architectures until `n_row` rows exist. Every
+    architecture/input group is therefore a complete, balanced sweep,
+    except possibly the last one.
+
+    Arguments:
+        n_row: The number of rows.
+        n_input (optional): The number of inputs per architecture.
+        n_hyper (optional): The number of hyperparameters.
+        hyper_cardinality (optional): The number of values of each
+            hyperparameter.
+        n_split (optional): The number of splits.
+        seed (optional): Seed for the synthetic metrics.
+
+    Returns:
+        df_fit: A pd.DataFrame with identifier, hyperparameter and
+            metric columns.
+
+    """
+    rng = np.random.RandomState(seed)
+    idx = np.arange(n_row)
+
+    data = {}
+    data['split'] = idx % n_split
+    idx = idx // n_split
+    hyper_values = {}
+    for i in range(n_hyper):
+        hyper_values['hyp_h{0}'.format(i)] = idx % hyper_cardinality
+        idx = idx // hyper_cardinality
+    data['input_id'] = idx % n_input
+    data['arch_id'] = idx // n_input
+    data['split_seed'] = np.full(n_row, 252)
+    data['n_split'] = np.full(n_row, n_split)
+    data.update(hyper_values)
+
+    data['n_epoch'] = rng.randint(10, 1000, n_row)
+    data['train_time_s'] = rng.gamma(2., 100., n_row)
+    data['loss'] = rng.rand(n_row)
+    data['loss_val'] = data['loss'] + .1 * rng.rand(n_row)
+
+    columns = [
+        'arch_id', 'input_id', 'split_seed', 'n_split', 'split'
+    ] + list(hyper_values.keys()) + [
+        'n_epoch', 'train_time_s', 'loss', 'loss_val'
+    ]
+    df_fit = pd.DataFrame(data, columns=columns)
+    return df_fit
@@ -13,12 +13,40 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # ============================================================================
-"""Top-level initialization."""
+"""Top-level initialization.
+
+Submodules are imported lazily on first attribute access so that
+importing `tidy_models` (e.g., in a `multicuda` child process) does not
+pull in pandas or NumPy.
+
+"""
+
+import importlib
 
 from tidy_models.model_identifier import ModelIdentifier
-import tidy_models.databases
-import tidy_models.utils
 
 __all__ = [
     'ModelIdentifier',
-]
\ No newline at end of file
+]
+
+_LAZY_SUBMODULES = [
+    'databases',
+    'multicuda',
+    'profiling',
+    'successive_halving',
+    'utils',
+]
+
+
+def __getattr__(name):
+    """Import submodules on first use."""
+    if name in _LAZY_SUBMODULES:
+        return importlib.import_module('tidy_models.' + name)
+    raise AttributeError(
+        "module '{0}' has no attribute '{1}'".format(__name__, name)
+    )
+
+
+def __dir__():
+    """List attributes, including lazy submodules."""
+    return sorted(set(globals().keys()) | set(_LAZY_SUBMODULES))
\ No newline at end of file
@@ -13,18 +13,68 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # ============================================================================
-"""Databases module."""
+"""Databases module.
 
-from tidy_models.databases.pandas.core import load_db
-from tidy_models.databases.pandas.core import save_db
-from tidy_models.databases.pandas.core import is_match
-from tidy_models.databases.pandas.core import find
-from tidy_models.databases.pandas.core import update_one
+Functions are imported lazily on first use so that importing
+`tidy_models.databases` does not pull in pandas.
+
+"""
+
+import importlib
 
 __all__ = [
     'load_db',
     'save_db',
+    'compact_db',
+    'append_result',
     'is_match',
     'find',
+    'find_many',
     'update_one',
+    'create_sharded_db',
+    'load_sharded_db',
+    'save_sharded_db',
+    'update_one_sharded',
+    'Eq',
+    'In',
+    'Range',
+    'Not',
+    'QueryIndex',
 ]
+
+# Map of public names to the module that defines them.
+_LAZY_ATTRS = {
+    'load_db': 'tidy_models.databases.pandas.core',
+    'save_db': 'tidy_models.databases.pandas.core',
+    'compact_db': 'tidy_models.databases.pandas.core',
+    'append_result': 'tidy_models.databases.writer',
+    'is_match': 'tidy_models.databases.pandas.core',
+    'find': 'tidy_models.databases.pandas.core',
+    'find_many': 'tidy_models.databases.pandas.core',
+    'update_one': 'tidy_models.databases.pandas.core',
+    'create_sharded_db': 'tidy_models.databases.pandas.sharded',
+    'load_sharded_db': 'tidy_models.databases.pandas.sharded',
+    'save_sharded_db': 'tidy_models.databases.pandas.sharded',
+    'update_one_sharded': 'tidy_models.databases.pandas.sharded',
+    'Eq': 'tidy_models.databases.pandas.query',
+    'In': 'tidy_models.databases.pandas.query',
+    'Range': 'tidy_models.databases.pandas.query',
+    'Not': 'tidy_models.databases.pandas.query',
+    'QueryIndex': 'tidy_models.databases.pandas.query',
+}
+
+
+def __getattr__(name):
+    """Import public functions on first use."""
+    if name in _LAZY_ATTRS:
+        value = getattr(importlib.import_module(_LAZY_ATTRS[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(
+        "module '{0}' has no attribute '{1}'".format(__name__, name)
+    )
+
+
+def __dir__():
+    """List attributes, including lazy functions."""
+    return sorted(set(globals().keys()) | set(_LAZY_ATTRS.keys()))
@@ -16,18 +16,61 @@
 """Databases module.
 
 Functions:
+    create_empty_db:
     load_db:
+    clear_cache:
+    compact_db:
+    merge_records:
     save_db:
+    infer_schema:
+    load_schema:
+    save_schema:
     is_match:
     find:
+    find_many:
     update_one:
 
 """
 
+import collections
+import json
+import os
+import shutil
+import threading
+import uuid
+import warnings
+
+import numpy as np
 import pandas as pd
 
+from tidy_models import profiling
+from tidy_models.databases import writer
+from tidy_models.databases.pandas import query
+
+# Columns that identify a model (see `ModelIdentifier.as_dict`). Columns
+# with the prefix `HYPER_PREFIX` are also treated as identifiers.
+ID_COLUMNS = ['arch_id', 'input_id', 'split_seed', 'n_split', 'split']
+HYPER_PREFIX = 'hyp_'
+
+SCHEMA_SUFFIX = '.schema.json'
+
+# Maximum number of DataFrames kept by the `load_db` cache.
+CACHE_SIZE = 8
+
+_cache = collections.OrderedDict()
+_cache_lock = threading.Lock()
+
+# Key of `DataFrame.attrs` that records the staging file prefix merged
+# into a loaded database, which `save_db` removes from the staging file.
+STAGED_ATTR = 'tidy_models_staged'
+
+# Columns added by `find_many`.
+INPUT_KEY = 'input_idx'
+ROW_KEY = 'row_idx'
+STATUS_KEY = 'status'
+
 
-def create_empty_db(fp, columns=['arch_id', 'input_id']):
+def create_empty_db(fp, columns=['arch_id', 'input_id'], metric_dtype=None):
     """Create empty database.
 
     Arguments:
@@ -36,68 +79,586 @@ def create_empty_db(fp, columns=['arch_id', 'input_id']):
             names constitute the minimum unique identifiers of a model.
             This list does not need to be exhaustive since columns can
             be retroactively added to a pd.DataFrame.
+        metric_dtype (optional): The dtype used to store floating point
+            metric columns, e.g., 'float32'. By default, metrics are
+            stored as 'float64'.
 
     """
     df = pd.DataFrame(
         columns=columns
     )
-    save_db(df, fp)
+    save_db(df, fp, metric_dtype=metric_dtype)
+
+
+@profiling.timed('load_db', rows=profiling.rows_of_result)
+def load_db(fp, schema=None, merge_staged=True, cache=True):
+    """Load DataFrame database.
+
+    Arguments:
+        fp: Filepath of database.
+        schema (optional): A schema dictionary (see `infer_schema`).
+            By default, the schema sidecar file saved alongside the
+            database is used if it exists. Columns without a schema
+            entry have their dtypes inferred.
+        merge_staged (optional): Boolean indicating if results appended
+            with `append_result` should be merged into the returned
+            DataFrame. The staging file itself is left untouched until
+            the DataFrame is saved with `save_db` (see `save_db`) or the
+            database is compacted with `compact_db`. The merged part of
+            the staging file is recorded in `df.attrs[STAGED_ATTR]`.
+        cache (optional): Boolean indicating if a process-level cache
+            should be used. Cached frames are keyed on the path, inode,
+            size and modification time of the database and its sidecar
+            files, so any change triggers a reload. Each call returns a
+            new DataFrame that callers may modify without affecting the
+            cache. If pandas copy-on-write mode is enabled
+            (`pd.options.mode.copy_on_write = True`), this copy is
+            free; otherwise the cached frame is copied in memory, which
+            is still much faster than parsing the file. The cache is
+            not used if `schema` is provided.
+
+    Returns:
+        df: Database DataFrame.
+
+    """
+    if not cache or schema is not None:
+        return _read_db(fp, schema, merge_staged)
+
+    key = (os.path.abspath(os.fspath(fp)), merge_staged)
+    state = (
+        _file_state(fp),
+        _file_state(os.fspath(fp) + SCHEMA_SUFFIX),
+        _file_state(writer.staging_path(fp)) if merge_staged else None,
+    )
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] == state:
+            _cache.move_to_end(key)
+            return _protected_copy(entry[1])
+
+    # NOTE: If the files change while being read, the cached frame is
+    # newer than `state` and is conservatively reloaded on the next call.
+    df = _read_db(fp, schema, merge_staged)
+    with _cache_lock:
+        _cache[key] = (state, df)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return _protected_copy(df)
+
+
+def clear_cache():
+    """Remove all DataFrames from the `load_db` cache."""
+    with _cache_lock:
+        _cache.clear()
+
+
+def _read_db(fp, schema, merge_staged):
+    """Read database from disk, see `load_db`."""
+    record_list = []
+    prefix = None
+    if merge_staged:
+        record_list, prefix = writer.read_staged(fp, return_prefix=True)
+
+    if len(record_list) > 0 and not os.path.exists(fp):
+        # Results were staged before the database was created.
+        df = pd.DataFrame()
+    elif schema is not None:
+        df = pd.read_csv(fp, header=0, sep=' ', dtype=schema['dtypes'])
+    else:
+        df = _read_csv(fp)
+
+    if len(record_list) > 0:
+        df = merge_records(df, record_list)
+    if prefix is not None:
+        df.attrs[STAGED_ATTR] = (os.path.abspath(os.fspath(fp)), prefix)
+    return df
 
 
-def load_db(fp):
-    """Load DataFrame database."""
+def _read_csv(fp):
+    """Read database file using its schema sidecar."""
+    # NOTE: `save_db` replaces the schema before the data, so a reader
+    # can see a new schema with old data. The sidecar therefore records
+    # the state of the data file it describes, which is compared with
+    # the opened data file. On a mismatch, the read is retried once and
+    # then falls back to inferred dtypes.
+    for _ in range(2):
+        with open(fp, 'r') as f:
+            schema = load_schema(fp)
+            if schema is None:
+                return pd.read_csv(f, header=0, sep=' ')
+            if _describes(schema, os.fstat(f.fileno())):
+                return pd.read_csv(
+                    f, header=0, sep=' ', dtype=schema['dtypes']
+                )
     return pd.read_csv(fp, header=0, sep=' ')
 
 
-def save_db(df, fp):
+def _describes(schema, st):
+    """Return whether a schema was saved with a data file."""
+    data_state = schema.get('data_state')
+    if data_state is None:
+        # Sidecars saved without a data state are trusted.
+        return True
+    return data_state == [st.st_size, st.st_mtime_ns]
+
+
+def compact_db(fp):
+    """Fold staged results into the database.
+
+    The staging file is locked while the database is rewritten, so
+    results appended concurrently are never lost.
+
+    Arguments:
+        fp: Filepath of database.
+
+    """
+    with writer.locked(fp) as f:
+        if len(writer.read_staged(fp)) == 0:
+            return
+        df = load_db(fp)
+        _write_db(df, fp, None, None)
+        f.truncate(0)
+
+
+def merge_records(df, record_list):
+    """Merge result records into a database.
+
+    Applies the same update rules as calling `update_one` for each
+    record in order, but with one keyed join per set of identifier
+    keys. Missing values in a record do not overwrite existing values.
+
+    Arguments:
+        df: DataFrame of fit database.
+        record_list: A list of dictionaries with keys 'id' and 'data'
+            (see `append_result`).
+
+    Returns:
+        df: The updated DataFrame.
+
+    """
+    attrs = df.attrs
+    # Group records that use the same identifier keys.
+    group_dict = {}
+    for record in record_list:
+        keys = tuple(record['id'].keys())
+        group_dict.setdefault(keys, []).append(
+            {**record['id'], **record['data']}
+        )
+
+    for keys, row_list in group_dict.items():
+        keys = list(keys)
+        # Identifier columns that do not exist yet never match.
+        df = df.assign(**{k: np.nan for k in keys if k not in df.columns})
+        # Later records take precedence.
+        df_stage = pd.DataFrame(row_list).groupby(
+            keys, sort=False, dropna=False
+        ).last().reset_index()
+        data_columns = [c for c in df_stage.columns if c not in keys]
+
+        df_match = find_many(df, df_stage[keys])
+        is_found = (df_match[STATUS_KEY] != 'missing').to_numpy()
+
+        # Update existing rows.
+        df_found = df_match[is_found]
+        if len(df_found) > 0:
+            df = df.copy()
+            row_idx = df_found[ROW_KEY].to_numpy().astype(df.index.dtype)
+            df_values = df_stage.iloc[df_found[INPUT_KEY].to_numpy()]
+            for col in data_columns:
+                values = df_values[col].to_numpy()
+                is_value = pd.notna(values)
+                if col not in df.columns:
+                    df[col] = np.nan
+                df.loc[row_idx[is_value], col] = values[is_value]
+
+        # Add new rows.
+        input_idx = df_match[INPUT_KEY][~is_found].to_numpy()
+        if len(input_idx) > 0:
+            df_new = df_stage.iloc[input_idx]
+            if len(df) == 0:
+                columns = list(df.columns) + [
+                    c for c in df_new.columns if c not in df.columns
+                ]
+                df = df_new.reindex(columns=columns).reset_index(drop=True)
+            else:
+                df = pd.concat([df, df_new], ignore_index=True)
+            # Re-sort by identifier keys to keep things tidy.
+            df = df.sort_values(keys)
+
+    # NOTE: `pd.concat` drops `attrs` of its inputs.
+    df.attrs = attrs
+    return df
+
+
+@profiling.timed('save_db', rows=profiling.rows_of_first_arg)
+def save_db(df, fp, schema=None, metric_dtype=None):
     """Save DataFrame database.
 
+    The database is saved along with a schema sidecar file so that
+    `load_db` can parse columns directly into compact dtypes.
+
+    If `df` was loaded from `fp` with `load_db`, the staged results
+    that were merged into it (see `load_db`) are removed from the
+    staging file, so they no longer override the saved values. Results
+    staged after `df` was loaded are kept and are merged on top of the
+    saved database. If `df.attrs` was lost (e.g., by `pd.concat`), all
+    staged results are kept.
+
     Arguments:
         df: Database DataFrame.
         fp: Save filepath.
+        schema (optional): A schema dictionary. By default, the schema
+            is inferred from `df` using `infer_schema`.
+        metric_dtype (optional): See `infer_schema`. By default, the
+            `metric_dtype` of an existing schema sidecar is kept.
 
     """
-    df.to_csv(fp, sep=' ', index=False)
+    staged = df.attrs.get(STAGED_ATTR)
+    _write_db(df, fp, schema, metric_dtype)
+    if staged is not None and staged[0] == os.path.abspath(os.fspath(fp)):
+        writer.discard_staged(fp, staged[1])
 
 
-def is_match(df, id_dict):
-    """Find a rows based on exact match to identifiers.
+def _write_db(df, fp, schema, metric_dtype):
+    """Write database to disk, see `save_db`."""
+    if schema is None:
+        if metric_dtype is None:
+            schema_prev = load_schema(fp)
+            if schema_prev is not None:
+                metric_dtype = schema_prev['metric_dtype']
+        schema = infer_schema(df, metric_dtype=metric_dtype)
+    # Cast columns so that values are written in their schema dtype,
+    # e.g., integral floats are written as integers.
+    cast_dict = {
+        k: v for k, v in schema['dtypes'].items()
+        if k in df.columns and str(df[k].dtype) != v
+    }
+    if len(cast_dict) > 0:
+        df = df.astype(cast_dict)
+    # Replace the schema first so that a reader never sees new data with
+    # a stale schema. The schema records the state of the new data file
+    # so that readers can detect old data with a new schema.
+    fp_tmp = _write_temp(
+        fp, lambda fp_tmp: df.to_csv(fp_tmp, sep=' ', index=False)
+    )
+    try:
+        st = os.stat(fp_tmp)
+        schema = dict(schema, data_state=[st.st_size, st.st_mtime_ns])
+        save_schema(schema, fp)
+        os.replace(fp_tmp, fp)
+    except BaseException:
+        _remove(fp_tmp)
+        raise
+
+
+def infer_schema(df, metric_dtype=None):
+    """Infer a compact schema for a database.
+
+    Integer identifier columns (`ID_COLUMNS` and hyperparameter
+    columns) are stored using the smallest integer dtype that fits them
+    and string identifiers are stored as categoricals. Since
+    `ID_COLUMNS` are always integers, they are also stored as integers
+    if they were upcast to floats. Floating point hyperparameters keep
+    their dtype (even if their values are integral) so that exact
+    matching and `ModelIdentifier` names are unaffected. Floating point
+    metric columns are stored using `metric_dtype`. Empty columns are
+    left out of the schema so their dtype is inferred when data
+    arrives.
+
+    Arguments:
+        df: Database DataFrame.
+        metric_dtype (optional): The dtype used to store floating point
+            metric columns, e.g., 'float32'.
+
+    Returns:
+        schema: A dictionary with keys 'dtypes' (a dictionary mapping
+            column names to dtype strings) and 'metric_dtype'. When
+            saved by `save_db`, the key 'data_state' is added, which
+            holds the size and modification time of the data file the
+            schema was saved with.
+
+    """
+    dtypes = {}
+    for col in df.columns:
+        series = df[col].infer_objects()
+        if series.isna().all():
+            continue
+        if col in ID_COLUMNS or col.startswith(HYPER_PREFIX):
+            dtypes[col] = _compact_id_dtype(
+                series, integral_float=col in ID_COLUMNS
+            )
+        elif metric_dtype is not None and \
+                pd.api.types.is_float_dtype(series.dtype):
+            dtypes[col] = str(np.dtype(metric_dtype))
+        else:
+            dtypes[col] = str(series.dtype)
+    schema = {
+        'dtypes': dtypes,
+        'metric_dtype': metric_dtype,
+    }
+    return schema
+
+
+def load_schema(fp):
+    """Load the schema sidecar of a database.
+
+    Arguments:
+        fp: Filepath of database.
+
+    Returns:
+        schema: A schema dictionary or `None` if no sidecar exists.
+
+    """
+    fp_schema = os.fspath(fp) + SCHEMA_SUFFIX
+    if not os.path.exists(fp_schema):
+        return None
+    with open(fp_schema, 'r') as f:
+        schema = json.load(f)
+    return schema
+
+
+def save_schema(schema, fp):
+    """Save the schema sidecar of a database.
+
+    Arguments:
+        schema: A schema dictionary.
+        fp: Filepath of database.
+
+    """
+    def write(fp_tmp):
+        with open(fp_tmp, 'w') as f:
+            json.dump(schema, f, indent=2, sort_keys=True)
+
+    _atomic_write(os.fspath(fp) + SCHEMA_SUFFIX, write)
+
+
+def _atomic_write(fp, write_fn):
+    """Write a file atomically.
+
+    The file is written to a temporary file in the same directory,
+    which then replaces `fp`. Concurrent readers therefore see either
+    the old or the new file, never a partially written one.
+
+    Arguments:
+        fp: Destination filepath.
+        write_fn: A function that writes the content to the filepath it
+            receives.
+
+    """
+    fp_tmp = _write_temp(fp, write_fn)
+    try:
+        os.replace(fp_tmp, fp)
+    except BaseException:
+        _remove(fp_tmp)
+        raise
+
+
+def _write_temp(fp, write_fn):
+    """Write a temporary file next to `fp` and return its filepath."""
+    fp = os.fspath(fp)
+    dp, fn = os.path.split(os.path.abspath(fp))
+    fp_tmp = os.path.join(dp, '.{0}.{1}.tmp'.format(fn, uuid.uuid4().hex))
+    # Create the file with the permissions of a regular file, i.e., the
+    # process umask is applied to 0666.
+    os.close(os.open(fp_tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666))
+    try:
+        write_fn(fp_tmp)
+        if os.path.exists(fp):
+            shutil.copymode(fp, fp_tmp)
+    except BaseException:
+        _remove(fp_tmp)
+        raise
+    return fp_tmp
+
+
+def _remove(fp):
+    """Remove a file if it exists."""
+    if os.path.exists(fp):
+        os.remove(fp)
+
+
+def _file_state(fp):
+    """Return (inode, size, mtime) of a file or `None` if missing."""
+    try:
+        st = os.stat(fp)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def _protected_copy(df):
+    """Return a copy of a cached DataFrame that is safe to modify."""
+    if pd.options.mode.copy_on_write is True:
+        return df.copy(deep=False)
+    return df.copy()
+
+
+def _compact_id_dtype(series, integral_float=False):
+    """Return the most compact dtype string for an identifier column.
+
+    If `integral_float` is `True`, floats with integral values are
+    treated as integers.
+
+    """
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return 'bool'
+    if series.isna().any():
+        return str(series.dtype)
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        values = series.to_numpy()
+        is_integer = pd.api.types.is_integer_dtype(series.dtype)
+        # NOTE: Integer identifiers are often upcast to floats when rows
+        # are added, so integral floats can also be treated as integers.
+        if is_integer or (integral_float and np.all(np.mod(values, 1) == 0)):
+            v_min = values.min()
+            v_max = values.max()
+            for dtype in ['int8', 'int16', 'int32']:
+                info = np.iinfo(dtype)
+                if info.min <= v_min and v_max <= info.max:
+                    return dtype
+            return 'int64'
+        return str(series.dtype)
+    return 'category'
+
+
+@profiling.timed('is_match', rows=profiling.rows_of_first_arg)
+def is_match(df, id_dict, index=None):
+    """Find a rows based on identifiers.
 
     Arguments:
         df:
-        id_dict: An identifier dictionary.
+        id_dict: An identifier dictionary. Values may also be
+            predicates (see `tidy_models.databases.pandas.query`),
+            e.g., `{'arch_id': In([0, 1]), 'split': Not(-1)}`.
+        index (optional): A QueryIndex built from `df` that is used to
+            look up identifier columns without scanning every row.
 
     Returns:
         loc: A Boolean index.
 
     """
-    loc = None
-    if len(df) > 0:
-        for k, v in id_dict.items():
-            if loc is None:
-                loc = df[k] == v
-            else:
-                loc = loc & (df[k] == v)
-    else:
-        loc = []
-    return loc
+    if len(df) == 0:
+        return pd.Series([], index=df.index, dtype=bool)
+    mask = query.evaluate(df, id_dict, index=index)
+    return pd.Series(mask, index=df.index)
 
 
-def find(df, match_dict):
-    """Find a rows based on exact match to identifiers.
+def find(df, match_dict, index=None):
+    """Find a rows based on identifiers.
 
     Arguments:
         df:
-        match_dict: An dictionary of key values to match.
+        match_dict: An dictionary of key values or predicates to
+            match. See `is_match`.
+        index (optional): See `is_match`.
 
     Returns:
         df: A DataFrame with any matching rows.
 
     """
-    loc = is_match(df, match_dict)
+    loc = is_match(df, match_dict, index=index)
     return df[loc]
 
 
+def find_many(df, id_list):
+    """Find rows for many identifiers in a single keyed join.
+
+    Arguments:
+        df: DataFrame of fit database.
+        id_list: A list of identifier dictionaries (e.g., from
+            `ModelIdentifier.as_dict`) or a pd.DataFrame with one
+            identifier per row. All identifiers must use the same keys.
+
+    Returns:
+        df_match: A pd.DataFrame with one row per matching database row
+            and a single row for each identifier without a match,
+            ordered by identifier. In addition to the identifier and
+            database columns, it contains the columns:
+            `INPUT_KEY`: The position of the identifier in `id_list`.
+            `ROW_KEY`: The index label of the matching database row, or
+                NaN if there is no match.
+            `STATUS_KEY`: 'found' if the identifier matches exactly one
+                row, 'missing' if it matches no rows, and 'duplicate'
+                if it matches more than one row.
+            Like `find`, missing values (NaN) never match, so
+            identifiers with missing values are always 'missing'.
+
+    Raises:
+        ValueError if the identifiers do not all use the same keys or
+            if a key or database column collides with the added
+            columns.
+        KeyError if `df` is not empty and an identifier key does not
+            exist in `df`.
+
+    """
+    if isinstance(id_list, pd.DataFrame):
+        df_id = id_list.reset_index(drop=True)
+    else:
+        id_list = list(id_list)
+        if len(id_list) > 0:
+            keys = list(id_list[0].keys())
+            for id_data in id_list:
+                if list(id_data.keys()) != keys:
+                    raise ValueError(
+                        'All identifiers must use the same keys.'
+                    )
+        df_id = pd.DataFrame(id_list)
+    keys = list(df_id.columns)
+    for col in [INPUT_KEY, ROW_KEY, STATUS_KEY]:
+        if col in keys or col in df.columns:
+            raise ValueError(
+                'Column `{0}` is reserved by `find_many`.'.format(col)
+            )
+    if len(df) > 0:
+        # Match `find`, which raises for unknown columns.
+        for k in keys:
+            if k not in df.columns:
+                raise KeyError(k)
+
+    if len(df_id) == 0:
+        columns = [INPUT_KEY] + list(df.columns) + [ROW_KEY, STATUS_KEY]
+        return pd.DataFrame(columns=columns)
+
+    df_id[INPUT_KEY] = np.arange(len(df_id))
+    if len(df) > 0:
+        df_right = df.copy()
+        df_right[ROW_KEY] = df.index
+        # Categorical and mixed-type keys are joined as objects so that
+        # they match plain Python values. Numeric keys are joined as is.
+        for k in keys:
+            is_numeric = (
+                pd.api.types.is_numeric_dtype(df_right[k].dtype) and
+                pd.api.types.is_numeric_dtype(df_id[k].dtype)
+            )
+            if df_right[k].dtype != df_id[k].dtype and not is_numeric:
+                df_right[k] = df_right[k].astype(object)
+                df_id[k] = df_id[k].astype(object)
+        # NOTE: Unlike `find`, `merge` matches missing keys to missing
+        # keys, so identifiers with missing values are never joined.
+        is_nan = df_id[keys].isna().any(axis=1).to_numpy()
+        df_match = df_id[~is_nan].merge(
+            df_right, on=keys, how='left', sort=False
+        )
+        if np.any(is_nan):
+            df_match = pd.concat([df_match, df_id[is_nan]]).sort_values(
+                INPUT_KEY, kind='stable'
+            )
+    else:
+        df_match = df_id.copy()
+        df_match[ROW_KEY] = np.nan
+
+    n_match = df_match.groupby(INPUT_KEY, sort=False)[ROW_KEY].transform(
+        'count'
+    ).to_numpy()
+    df_match[STATUS_KEY] = np.where(
+        n_match == 0, 'missing', np.where(n_match == 1, 'found', 'duplicate')
+    )
+    df_match = df_match.reset_index(drop=True)
+    return df_match
+
+
+@profiling.timed('update_one', rows=profiling.rows_of_first_arg)
 def update_one(df, id_data, assoc_data):
     """Update first row that is found.
 
@@ -111,13 +672,28 @@ def update_one(df, id_data, assoc_data):
     # Check if correspondig row already exists.
     loc = is_match(df, id_data)
 
-    # if len(df[loc]) > 1:
-    #     TODO: Throw warning if more than one match.
+    n_match = int(np.sum(loc))
+    if n_match > 1:
+        warnings.warn(
+            'Found {0} rows matching {1}. All of them will be '
+            'updated.'.format(n_match, id_data)
+        )
 
     if df[loc].empty:
         # Create new row and add.
+        attrs = df.attrs
         df_new = pd.DataFrame({**id_data, **assoc_data}, index=[len(df)])
-        df = pd.concat([df, df_new], ignore_index=True)
+        if len(df) == 0:
+            # NOTE: Concatenating with an empty DataFrame would upcast
+            # integer columns to floats.
+            columns = list(df.columns) + [
+                c for c in df_new.columns if c not in df.columns
+            ]
+            df = df_new.reindex(columns=columns).reset_index(drop=True)
+        else:
+            df = pd.concat([df, df_new], ignore_index=True)
+        # NOTE: `pd.concat` drops `attrs` of its inputs.
+        df.attrs = attrs
         # Re-sort by identifier keys to keep things tidy.
         df = df.sort_values(list(id_data.keys()))
     else:
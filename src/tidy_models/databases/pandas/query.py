@@ -0,0 +1,427 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Brett D. Roads. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+"""Query module.
+
+A query is a dictionary mapping column names to predicates. Plain
+values are treated as equality predicates, so an identifier dictionary
+is also a valid query. All predicates are combined with a logical AND.
+
+Example:
+    query = {
+        'arch_id': In([0, 1]),
+        'split': Not(-1),
+        'hyp_lr': Range(.0001, .01),
+    }
+
+Classes:
+    Eq: Equality predicate.
+    In: Set membership predicate.
+    Range: Range predicate.
+    Not: Negation predicate.
+    QueryIndex: Sorted index over identifier columns.
+
+Functions:
+    as_predicate: Convert a query value to a predicate.
+    evaluate: Evaluate a query on a DataFrame.
+
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class Eq(object):
+    """Equality predicate.
+
+    Attributes:
+        value: The value to match.
+
+    """
+
+    def __init__(self, value):
+        """Initialize.
+
+        Arguments:
+            value: The value to match.
+
+        """
+        super(Eq, self).__init__()
+        self.value = value
+
+    def mask(self, values):
+        """Return Boolean mask of matching `values`."""
+        return values == self.value
+
+    def bounds(self, sorted_values):
+        """Return list of (start, stop) bounds into `sorted_values`."""
+        return [(
+            np.searchsorted(sorted_values, self.value, side='left'),
+            np.searchsorted(sorted_values, self.value, side='right')
+        )]
+
+    def encode(self, categories):
+        """Return equivalent predicate on categorical codes."""
+        return Eq(_category_code(categories, self.value))
+
+    def __repr__(self):
+        return 'Eq({0!r})'.format(self.value)
+
+
+class In(object):
+    """Set membership predicate.
+
+    Attributes:
+        values: A list of values to match.
+
+    """
+
+    def __init__(self, values):
+        """Initialize.
+
+        Arguments:
+            values: An iterable of values to match. Repeated values
+                are removed.
+
+        """
+        super(In, self).__init__()
+        # NOTE: Repeated values would yield overlapping index bounds.
+        self.values = list(dict.fromkeys(values))
+
+    def mask(self, values):
+        """Return Boolean mask of matching `values`."""
+        return np.isin(values, self.values)
+
+    def bounds(self, sorted_values):
+        """Return list of (start, stop) bounds into `sorted_values`."""
+        v = np.asarray(self.values)
+        return list(zip(
+            np.searchsorted(sorted_values, v, side='left'),
+            np.searchsorted(sorted_values, v, side='right')
+        ))
+
+    def encode(self, categories):
+        """Return equivalent predicate on categorical codes."""
+        return In([_category_code(categories, v) for v in self.values])
+
+    def __repr__(self):
+        return 'In({0!r})'.format(self.values)
+
+
+class Range(object):
+    """Range predicate.
+
+    Attributes:
+        low: The lower bound. If `None`, there is no lower bound.
+        high: The upper bound. If `None`, there is no upper bound.
+        inclusive: Which bounds are inclusive. Can be 'both',
+            'neither', 'left' or 'right'.
+
+    """
+
+    def __init__(self, low=None, high=None, inclusive='both'):
+        """Initialize.
+
+        Arguments:
+            low (optional): The lower bound.
+            high (optional): The upper bound.
+            inclusive (optional): Which bounds are inclusive. Can be
+                'both', 'neither', 'left' or 'right'.
+
+        Raises:
+            ValueError if `inclusive` is not recognized.
+
+        """
+        super(Range, self).__init__()
+        if inclusive not in ['both', 'neither', 'left', 'right']:
+            raise ValueError('Unrecognized `inclusive`.')
+        self.low = low
+        self.high = high
+        self.inclusive = inclusive
+
+    def mask(self, values):
+        """Return Boolean mask of matching `values`."""
+        loc = np.ones(len(values), dtype=bool)
+        if self.low is not None:
+            if self.inclusive in ['both', 'left']:
+                loc &= values >= self.low
+            else:
+                loc &= values > self.low
+        if self.high is not None:
+            if self.inclusive in ['both', 'right']:
+                loc &= values <= self.high
+            else:
+                loc &= values < self.high
+        return loc
+
+    def bounds(self, sorted_values):
+        """Return list of (start, stop) bounds into `sorted_values`."""
+        start = 0
+        stop = len(sorted_values)
+        if self.low is not None:
+            side = 'left' if self.inclusive in ['both', 'left'] else 'right'
+            start = np.searchsorted(sorted_values, self.low, side=side)
+        if self.high is not None:
+            side = 'right' if self.inclusive in ['both', 'right'] else 'left'
+            stop = np.searchsorted(sorted_values, self.high, side=side)
+        return [(start, max(start, stop))]
+
+    def encode(self, categories):
+        """Categorical codes are not ordered, so return `None`."""
+        return None
+
+    def __repr__(self):
+        return 'Range({0!r}, {1!r}, inclusive={2!r})'.format(
+            self.low, self.high, self.inclusive
+        )
+
+
+class Not(object):
+    """Negation predicate.
+
+    Attributes:
+        predicate: The negated predicate.
+
+    """
+
+    def __init__(self, predicate):
+        """Initialize.
+
+        Arguments:
+            predicate: A predicate or plain value (treated as equality)
+                to negate.
+
+        """
+        super(Not, self).__init__()
+        self.predicate = as_predicate(predicate)
+
+    def mask(self, values):
+        """Return Boolean mask of matching `values`."""
+        return ~self.predicate.mask(values)
+
+    def bounds(self, sorted_values):
+        """Negations are not looked up in an index, so return `None`."""
+        return None
+
+    def encode(self, categories):
+        """Return equivalent predicate on categorical codes."""
+        predicate = self.predicate.encode(categories)
+        if predicate is None:
+            return None
+        return Not(predicate)
+
+    def __repr__(self):
+        return 'Not({0!r})'.format(self.predicate)
+
+
+PREDICATES = (Eq, In, Range, Not)
+
+
+class QueryIndex(object):
+    """Sorted index over identifier columns.
+
+    Speeds up selective queries by looking up candidate rows with a
+    binary search instead of scanning every row. The index describes a
+    specific DataFrame and must be rebuilt if the DataFrame changes.
+    Changes to the rows (e.g., filtering or sorting) are detected using
+    the DataFrame's index, but changes to values in place are not.
+
+    Attributes:
+        columns: The indexed columns.
+        n_row: The number of rows of the indexed DataFrame.
+
+    Methods:
+        lookup: Return sorted row positions matching a predicate.
+        matches: Return whether the index describes a DataFrame.
+
+    """
+
+    def __init__(self, df, columns):
+        """Initialize.
+
+        Arguments:
+            df: A pd.DataFrame.
+            columns: A list of columns to index.
+
+        """
+        super(QueryIndex, self).__init__()
+        self.columns = list(columns)
+        self.n_row = len(df)
+        self._row_index = df.index
+        self._order = {}
+        self._sorted = {}
+        self._categories = {}
+        for col in self.columns:
+            values, categories = _column_values(df[col])
+            order = np.argsort(values, kind='stable')
+            self._order[col] = order
+            self._sorted[col] = values[order]
+            self._categories[col] = categories
+
+    def __contains__(self, col):
+        return col in self._order
+
+    def matches(self, df):
+        """Return whether the index describes a DataFrame.
+
+        Arguments:
+            df: A pd.DataFrame.
+
+        Returns:
+            is_match: `True` if `df` has the same rows, in the same
+                order, as the indexed DataFrame.
+
+        """
+        if len(df) != self.n_row:
+            return False
+        return df.index is self._row_index or df.index.equals(
+            self._row_index
+        )
+
+    def lookup(self, col, predicate):
+        """Return sorted row positions matching a predicate.
+
+        Arguments:
+            col: An indexed column.
+            predicate: A predicate.
+
+        Returns:
+            positions: A sorted array of row positions or `None` if
+                the predicate cannot be looked up in the index.
+
+        """
+        categories = self._categories[col]
+        if categories is not None:
+            predicate = predicate.encode(categories)
+            if predicate is None:
+                return None
+        bounds = predicate.bounds(self._sorted[col])
+        if bounds is None:
+            return None
+        order = self._order[col]
+        positions = np.concatenate(
+            [order[start:stop] for start, stop in bounds] +
+            [np.empty(0, dtype=order.dtype)]
+        )
+        # NOTE: Positions must be unique so that candidates can be
+        # intersected.
+        return np.unique(positions)
+
+
+def as_predicate(value):
+    """Convert a query value to a predicate.
+
+    Arguments:
+        value: A predicate or a plain value.
+
+    Returns:
+        predicate: The predicate itself or an `Eq` predicate.
+
+    """
+    if isinstance(value, PREDICATES):
+        return value
+    return Eq(value)
+
+
+def evaluate(df, query, index=None):
+    """Evaluate a query on a DataFrame.
+
+    Predicates on columns covered by `index` are resolved with a binary
+    search and the remaining predicates are only evaluated on the
+    candidate rows. Without an index, every predicate is evaluated as a
+    vectorized operation on the underlying arrays and combined in place
+    into a single mask.
+
+    Arguments:
+        df: A pd.DataFrame.
+        query: A dictionary mapping column names to predicates or plain
+            values.
+        index (optional): A QueryIndex built from `df`.
+
+    Returns:
+        mask: A Boolean np.ndarray with one element per row.
+
+    Raises:
+        KeyError if a queried column does not exist.
+        ValueError if `index` does not match `df`.
+
+    """
+    n_row = len(df)
+    if index is not None and not index.matches(df):
+        raise ValueError(
+            'The provided `index` is out of date and must be rebuilt.'
+        )
+
+    candidates = None
+    scan_list = []
+    for col, value in query.items():
+        predicate = as_predicate(value)
+        positions = None
+        if index is not None and col in index:
+            positions = index.lookup(col, predicate)
+        if positions is None:
+            scan_list.append((col, predicate))
+        elif candidates is None:
+            candidates = positions
+        else:
+            candidates = np.intersect1d(
+                candidates, positions, assume_unique=True
+            )
+
+    if candidates is None:
+        mask = np.ones(n_row, dtype=bool)
+        for col, predicate in scan_list:
+            mask &= _column_mask(df[col], predicate)
+        return mask
+
+    keep = np.ones(len(candidates), dtype=bool)
+    for col, predicate in scan_list:
+        keep &= _column_mask(df[col], predicate, positions=candidates)
+    mask = np.zeros(n_row, dtype=bool)
+    mask[candidates[keep]] = True
+    return mask
+
+
+def _column_values(series):
+    """Return comparable values and categories (if categorical)."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories
+    return series.to_numpy(), None
+
+
+def _column_mask(series, predicate, positions=None):
+    """Evaluate a predicate on a column, optionally at `positions`."""
+    values, categories = _column_values(series)
+    if categories is not None:
+        predicate_codes = predicate.encode(categories)
+        if predicate_codes is None:
+            values = series.to_numpy()
+        else:
+            predicate = predicate_codes
+    if positions is not None:
+        values = values[positions]
+    return np.asarray(predicate.mask(values), dtype=bool)
+
+
+def _category_code(categories, value):
+    """Return categorical code of `value`, or -2 if it does not exist.
+
+    NOTE: -1 is reserved for missing values so -2 never matches.
+
+    """
+    code = categories.get_indexer([value])[0]
+    if code == -1:
+        code = -2
+    return code
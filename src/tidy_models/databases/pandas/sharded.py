@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Brett D. Roads. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+"""Sharded database module.
+
+A sharded database is a directory containing one database file per
+unique combination of shard keys (e.g., `arch_id` and `input_id`) and a
+manifest that maps key values to shard files. Each shard is a regular
+database that is read and written with `load_db` and `save_db`. Shard
+file names are derived from the key values, so processes writing
+different shards never interfere and the manifest only changes (under
+a file lock) when a shard is added.
+
+Functions:
+    create_sharded_db: Create an empty sharded database.
+    load_sharded_db: Load the shards selected by identifiers.
+    save_sharded_db: Save a DataFrame, rewriting only affected shards.
+    update_one_sharded: Update a single row, rewriting only its shard.
+
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import tidy_models.databases.pandas.core as db
+from tidy_models.databases import writer
+from tidy_models.databases.pandas import query
+
+MANIFEST_NAME = 'manifest.json'
+LOCK_NAME = 'manifest.json.lock'
+
+
+def create_sharded_db(dp, keys=['arch_id', 'input_id']):
+    """Create an empty sharded database.
+
+    Arguments:
+        dp: Directory path of the database. It is created if it does
+            not exist.
+        keys (optional): List of columns used to partition rows into
+            shards.
+
+    """
+    os.makedirs(dp, exist_ok=True)
+    manifest = {
+        'keys': list(keys),
+        'shards': [],
+    }
+    _save_manifest(manifest, dp)
+
+
+def load_sharded_db(dp, id_data=None, n_worker=None):
+    """Load the shards selected by identifiers.
+
+    Only shards whose key values are compatible with `id_data` are
+    read. When more than one shard is read, shards are loaded in
+    parallel using a thread pool.
+
+    Arguments:
+        dp: Directory path of the database.
+        id_data (optional): A dictionary of identifiers or predicates
+            (see `is_match`). By default, all shards are loaded.
+        n_worker (optional): The maximum number of threads used to read
+            shards. By default, uses the ThreadPoolExecutor default.
+
+    Returns:
+        df: A DataFrame of rows matching `id_data`, ordered by shard.
+
+    """
+    manifest = _load_manifest(dp)
+    shard_list = _select_shards(manifest, id_data)
+
+    fp_list = [os.path.join(dp, shard['file']) for shard in shard_list]
+    if len(fp_list) == 0:
+        return pd.DataFrame(columns=manifest['keys'])
+    elif len(fp_list) == 1:
+        df_list = [db.load_db(fp_list[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=n_worker) as executor:
+            df_list = list(executor.map(db.load_db, fp_list))
+
+    df = pd.concat(df_list, ignore_index=True)
+    if id_data is not None:
+        df = db.find(df, id_data).reset_index(drop=True)
+    return df
+
+
+def save_sharded_db(df, dp, mode='merge'):
+    """Save a DataFrame, rewriting only affected shards.
+
+    Rows are partitioned by the shard keys. Shards without rows in `df`
+    are left untouched, so a DataFrame containing a subset of the
+    shards only rewrites that subset.
+
+    Arguments:
+        df: Database DataFrame. Must contain all shard keys.
+        dp: Directory path of the database.
+        mode (optional): How rows are written to existing shards. If
+            'merge', rows of `df` replace the shard rows with the same
+            identifiers (the shard keys, `ID_COLUMNS` and
+            hyperparameter columns present in `df`) and all other shard
+            rows are kept, so a DataFrame loaded with a filter can be
+            saved safely. If 'replace', every shard with rows in `df`
+            is replaced by those rows, which drops rows not in `df`.
+
+    Raises:
+        ValueError if a shard key is missing or contains missing values
+            or if `mode` is not recognized.
+
+    """
+    if mode not in ['merge', 'replace']:
+        raise ValueError('Unrecognized `mode`.')
+    manifest = _load_manifest(dp)
+    keys = manifest['keys']
+    for k in keys:
+        if k not in df.columns:
+            raise ValueError('Missing shard key `{0}`.'.format(k))
+        if df[k].isna().any():
+            raise ValueError(
+                'Shard key `{0}` contains missing values.'.format(k)
+            )
+    if len(df) == 0:
+        return
+
+    file_dict = {
+        tuple(shard['values']): shard['file']
+        for shard in manifest['shards']
+    }
+    new_list = []
+    for values, df_shard in df.groupby(keys, sort=True, observed=True):
+        if not isinstance(values, tuple):
+            values = (values,)
+        values = tuple(_to_json_value(v) for v in values)
+        fn = file_dict.get(values)
+        if fn is None:
+            fn = _shard_name(values)
+            new_list.append({'values': list(values), 'file': fn})
+        fp_shard = os.path.join(dp, fn)
+        # NOTE: A new shard may have been created by another process.
+        if mode == 'merge' and os.path.exists(fp_shard):
+            df_shard = _merge_shard(db.load_db(fp_shard), df_shard, keys)
+        db.save_db(df_shard, fp_shard)
+
+    # Shards are written before they are added to the manifest, so
+    # readers never see a manifest entry without a file.
+    if len(new_list) > 0:
+        with writer.file_lock(os.path.join(dp, LOCK_NAME)):
+            manifest = _load_manifest(dp)
+            file_set = set(shard['file'] for shard in manifest['shards'])
+            manifest['shards'].extend(
+                [shard for shard in new_list if shard['file'] not in file_set]
+            )
+            _save_manifest(manifest, dp)
+
+
+def update_one_sharded(dp, id_data, assoc_data):
+    """Update a single row, rewriting only its shard.
+
+    See `update_one`.
+
+    Arguments:
+        dp: Directory path of the database.
+        id_data: Dictionary of identifying keys. Must contain a plain
+            value for every shard key.
+        assoc_data: Dictionary of data that should be associated with
+            identifiers.
+
+    Raises:
+        ValueError if `id_data` does not identify a single shard.
+
+    """
+    manifest = _load_manifest(dp)
+    for k in manifest['keys']:
+        if k not in id_data or isinstance(id_data[k], query.PREDICATES):
+            raise ValueError(
+                'Requires a value for shard key `{0}`.'.format(k)
+            )
+    shard_list = _select_shards(manifest, id_data)
+    if len(shard_list) == 0:
+        df = pd.DataFrame(columns=manifest['keys'])
+    else:
+        df = db.load_db(os.path.join(dp, shard_list[0]['file']))
+    df = db.update_one(df, id_data, assoc_data)
+    # The full shard was loaded, so it can be replaced.
+    save_sharded_db(df, dp, mode='replace')
+
+
+def _select_shards(manifest, id_data):
+    """Return manifest entries of shards compatible with `id_data`."""
+    shard_list = manifest['shards']
+    if id_data is None or len(shard_list) == 0:
+        return shard_list
+    keys = manifest['keys']
+    key_query = {k: v for k, v in id_data.items() if k in keys}
+    if len(key_query) == 0:
+        return shard_list
+    df_keys = pd.DataFrame(
+        [shard['values'] for shard in shard_list], columns=keys
+    )
+    mask = query.evaluate(df_keys, key_query)
+    return [shard for shard, m in zip(shard_list, mask) if m]
+
+
+def _merge_shard(df_old, df_new, keys):
+    """Replace rows of `df_old` that share identifiers with `df_new`."""
+    id_keys = list(keys) + [
+        k for k in df_new.columns
+        if k not in keys and (
+            k in db.ID_COLUMNS or k.startswith(db.HYPER_PREFIX)
+        )
+    ]
+    # Identifier columns that do not exist yet never match.
+    df_old = df_old.assign(
+        **{k: np.nan for k in id_keys if k not in df_old.columns}
+    )
+    df_match = db.find_many(df_old[id_keys], df_new[id_keys])
+    row_idx = df_match[db.ROW_KEY].dropna().to_numpy().astype(
+        df_old.index.dtype
+    )
+    df_old = df_old.drop(index=np.unique(row_idx))
+    if len(df_old) == 0:
+        return df_new
+    df = pd.concat([df_old, df_new], ignore_index=True)
+    # Keep the staging file prefix recorded by `load_db` (if any).
+    df.attrs = df_new.attrs
+    # Re-sort by identifier keys to keep things tidy.
+    return df.sort_values(id_keys, kind='stable', ignore_index=True)
+
+
+def _shard_name(values):
+    """Return the file name of a shard derived from its key values."""
+    digest = hashlib.sha1(json.dumps(list(values)).encode('utf-8'))
+    return 'shard-{0}.txt'.format(digest.hexdigest()[0:16])
+
+
+def _to_json_value(v):
+    """Convert NumPy scalars to Python scalars."""
+    if hasattr(v, 'item'):
+        return v.item()
+    return v
+
+
+def _load_manifest(dp):
+    """Load manifest of a sharded database."""
+    with open(os.path.join(dp, MANIFEST_NAME), 'r') as f:
+        manifest = json.load(f)
+    return manifest
+
+
+def _save_manifest(manifest, dp):
+    """Atomically save manifest of a sharded database."""
+    def write(fp_tmp):
+        with open(fp_tmp, 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    db._atomic_write(os.path.join(dp, MANIFEST_NAME), write)
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Brett D. Roads. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+"""Lightweight result writer module.
+
+Only depends on the standard library so that training workers can
+record results without importing pandas or loading the fit database.
+Results are appended to a staging file next to the database, which
+`load_db` merges and `save_db` or `compact_db` fold into the database.
+
+Functions:
+    append_result: Append a single result to the staging file.
+    read_staged: Read all results from the staging file.
+    discard_staged: Remove results that have been saved.
+    staging_path: Return the staging filepath of a database.
+    locked: Context manager that holds the staging file lock.
+    file_lock: Context manager that holds an exclusive file lock.
+
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+
+try:
+    import fcntl
+except ImportError:
+    # NOTE: Without `fcntl`, appends rely on the atomicity of a single
+    # write to a file opened in append mode.
+    fcntl = None
+
+STAGING_SUFFIX = '.staging.jsonl'
+
+
+def staging_path(fp):
+    """Return the staging filepath of a database.
+
+    Arguments:
+        fp: Filepath of database.
+
+    Returns:
+        fp_staging: Filepath of the staging file.
+
+    """
+    return os.fspath(fp) + STAGING_SUFFIX
+
+
+@contextlib.contextmanager
+def locked(fp):
+    """Context manager that holds the staging file lock.
+
+    Arguments:
+        fp: Filepath of database.
+
+    Yields:
+        f: The staging file, opened in append mode.
+
+    """
+    with file_lock(staging_path(fp)) as f:
+        yield f
+
+
+@contextlib.contextmanager
+def file_lock(fp_lock):
+    """Context manager that holds an exclusive file lock.
+
+    Without `fcntl`, no lock is taken.
+
+    Arguments:
+        fp_lock: Filepath of the locked file. It is created if it does
+            not exist.
+
+    Yields:
+        f: The locked file, opened in append mode.
+
+    """
+    with open(fp_lock, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield f
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def append_result(fp, id_data, assoc_data):
+    """Append a single result to the staging file.
+
+    Safe for many concurrent processes: each record is written as a
+    single line while holding an exclusive file lock.
+
+    Arguments:
+        fp: Filepath of database.
+        id_data: Dictionary of identifying keys, e.g., from
+            `ModelIdentifier.as_dict`.
+        assoc_data: Dictionary of data that should be associated with
+            identifiers.
+
+    """
+    record = {'id': id_data, 'data': assoc_data}
+    line = json.dumps(record, default=_to_json) + '\n'
+    with locked(fp) as f:
+        f.write(line)
+        f.flush()
+
+
+def read_staged(fp, return_prefix=False):
+    """Read all results from the staging file.
+
+    Arguments:
+        fp: Filepath of database.
+        return_prefix (optional): Boolean indicating if the prefix of
+            the staging file that was read should also be returned.
+
+    Returns:
+        record_list: A list of dictionaries with keys 'id' and 'data',
+            in the order they were appended. An incomplete last line
+            (from a write in progress) is ignored.
+        prefix (optional): A tuple `(n_byte, digest)` describing the
+            complete lines that were read (see `discard_staged`).
+
+    """
+    fp_staging = staging_path(fp)
+    content = b''
+    if os.path.exists(fp_staging):
+        with open(fp_staging, 'rb') as f:
+            content = f.read()
+    content = content[:content.rfind(b'\n') + 1]
+    record_list = []
+    for line in content.decode('utf-8').split('\n'):
+        if line.strip():
+            record_list.append(json.loads(line))
+    if return_prefix:
+        return record_list, _prefix(content)
+    return record_list
+
+
+def discard_staged(fp, prefix):
+    """Remove results that have been saved.
+
+    Results appended after `prefix` was read are kept. If the staging
+    file no longer starts with `prefix` (e.g., because it was compacted
+    by another process), it is left untouched.
+
+    Arguments:
+        fp: Filepath of database.
+        prefix: A prefix returned by `read_staged`.
+
+    """
+    n_byte = prefix[0]
+    if n_byte == 0 or not os.path.exists(staging_path(fp)):
+        return
+    with locked(fp) as f:
+        with open(staging_path(fp), 'rb') as f_read:
+            content = f_read.read()
+        if _prefix(content[:n_byte]) != prefix:
+            return
+        f.truncate(0)
+        f.write(content[n_byte:].decode('utf-8'))
+        f.flush()
+
+
+def _prefix(content):
+    """Return `(n_byte, digest)` of staging file content."""
+    return (len(content), hashlib.sha1(content).hexdigest())
+
+
+def _to_json(v):
+    """Convert NumPy scalars to Python scalars."""
+    if hasattr(v, 'item'):
+        return v.item()
+    raise TypeError(
+        'Object of type {0} is not JSON serializable.'.format(
+            type(v).__name__
+        )
+    )
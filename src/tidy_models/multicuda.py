@@ -13,49 +13,289 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # ==============================================================================
-"""Multi-processing functions for CUDA-bound processes."""
+"""Multi-processing functions for CUDA-bound processes.
+
+Classes:
+    SharedArray: A lightweight, picklable handle to an array stored in
+        shared memory.
+
+Functions:
+    share_array: Copy an array into shared memory.
+    cpu_slots: Partition CPU cores into disjoint slots.
+    pin_cpu_slot: Pin the current process to a CPU slot.
+    cuda_manager: Evaluate a target function for a list of tasks.
+    cuda_child: Child process of the CUDA manager.
+
+"""
 
 import multiprocessing
+from multiprocessing import shared_memory
 import os
 
+from tidy_models import profiling
+
+# Environment variables controlling the thread count of common
+# BLAS/OpenMP runtimes.
+THREAD_ENV_VARS = [
+    'OMP_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'BLIS_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS',
+    'NUMEXPR_NUM_THREADS',
+]
+
+
+class SharedArray(object):
+    """A lightweight, picklable handle to an array in shared memory.
+
+    Only the handle is pickled when a task is sent to a child process.
+    The child maps the underlying segment as a zero-copy NumPy view.
+
+    Attributes:
+        name: The name of the shared memory segment.
+        shape: The shape of the array.
+        dtype: The dtype string of the array.
+        writeable: Boolean indicating if views of the array are
+            writeable.
+
+    Methods:
+        attach: Return a zero-copy view of the shared array.
+
+    """
+
+    def __init__(self, name, shape, dtype, writeable=False):
+        """Initialize.
+
+        Arguments:
+            name: The name of the shared memory segment.
+            shape: The shape of the array.
+            dtype: The dtype string of the array.
+            writeable (optional): Boolean indicating if views of the
+                array are writeable. Since all tasks see the same
+                memory, views are read-only by default.
+
+        """
+        super(SharedArray, self).__init__()
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.writeable = writeable
+
+    def attach(self):
+        """Return a zero-copy view of the shared array.
+
+        Returns:
+            shm: The attached multiprocessing.shared_memory.SharedMemory
+                object. The caller must keep a reference to `shm` for
+                as long as the view is in use.
+            arr: A NumPy array backed by the shared memory segment.
+
+        """
+        import numpy as np
+
+        shm = shared_memory.SharedMemory(name=self.name)
+        arr = np.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf)
+        arr.flags.writeable = self.writeable
+        return shm, arr
+
+
+def share_array(arr, writeable=False):
+    """Copy an array into shared memory.
+
+    The caller owns the returned segment and is responsible for
+    calling `close` and `unlink` on it. When using `cuda_manager`,
+    prefer the `shared_data` argument, which manages segments
+    automatically.
+
+    Arguments:
+        arr: An array-like object.
+        writeable (optional): Boolean indicating if views of the
+            array are writeable.
+
+    Returns:
+        shm: The multiprocessing.shared_memory.SharedMemory object
+            holding the data.
+        handle: A SharedArray handle that can be placed in task
+            arguments.
+
+    """
+    import numpy as np
+
+    arr = np.ascontiguousarray(arr)
+    # NOTE: Zero-size segments are not allowed.
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    arr_shared = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+    arr_shared[...] = arr
+    del arr_shared
+    handle = SharedArray(
+        shm.name, arr.shape, arr.dtype.str, writeable=writeable
+    )
+    return shm, handle
+
+
+def cpu_slots(slot_size=1, cpu_id_list=None):
+    """Partition CPU cores into disjoint slots.
 
-def cuda_manager(target, args_list, cuda_id_list, n_concurrent=None):
+    Arguments:
+        slot_size (optional): The number of cores in each slot.
+        cpu_id_list (optional): A list of eligable CPU core IDs. By
+            default, all cores available to the current process are
+            used.
+
+    Returns:
+        slot_list: A list of tuples, where each tuple contains the
+            core IDs of one slot. Leftover cores that do not fill a
+            complete slot are not used.
+
+    Raises:
+        ValueError if there are fewer cores than `slot_size`.
+
+    """
+    if cpu_id_list is None:
+        if hasattr(os, 'sched_getaffinity'):
+            cpu_id_list = sorted(os.sched_getaffinity(0))
+        else:
+            cpu_id_list = list(range(os.cpu_count()))
+    slot_size = int(slot_size)
+    if slot_size < 1 or len(cpu_id_list) < slot_size:
+        raise ValueError(
+            'Cannot create slots of size {0} from {1} cores.'.format(
+                slot_size, len(cpu_id_list)
+            )
+        )
+
+    n_slot = len(cpu_id_list) // slot_size
+    slot_list = [
+        tuple(cpu_id_list[i * slot_size:(i + 1) * slot_size])
+        for i in range(n_slot)
+    ]
+    return slot_list
+
+
+def pin_cpu_slot(cpu_slot):
+    """Pin the current process to a CPU slot.
+
+    Restricts the process to the cores in `cpu_slot` and sets the
+    thread counts of common BLAS/OpenMP runtimes to match.
+
+    NOTE: Thread-count environment variables only take effect for
+    libraries that are loaded after pinning. Libraries already loaded
+    by the parent process (e.g., when using the 'fork' start method)
+    are still confined by the CPU affinity.
+
+    Arguments:
+        cpu_slot: A tuple of CPU core IDs.
+
+    """
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpu_slot)
+    n_thread = '{0}'.format(len(cpu_slot))
+    for k in THREAD_ENV_VARS:
+        os.environ[k] = n_thread
+
+
+def cuda_manager(
+        target, args_list, cuda_id_list, n_concurrent=None,
+        shared_data=None, cpu_slot_size=None, cpu_id_list=None):
     """Create CUDA manager.
 
     Arguments:
         target: A target function to be evaluated.
         args_list: A list of dictionaries, where each dictionary
             contains the arguments necessary for the target function.
-        cuda_id_list: A list of eligable CUDA IDs.
+            Values that are SharedArray handles are replaced by
+            zero-copy NumPy views before `target` is called.
+        cuda_id_list: A list of eligable CUDA IDs. If `None`, CUDA
+            devices are not assigned and `CUDA_VISIBLE_DEVICES` is
+            left untouched, which requires `cpu_slot_size`.
         n_concurrent (optional): The number of concurrent CUDA
             processes allowed. By default this is equal to the length
-            of `cuda_id_list`.
+            of `cuda_id_list` (or the number of CPU slots, whichever is
+            smaller).
+        shared_data (optional): A dictionary of large arrays that
+            should be passed to every task. Each array is copied into
+            shared memory once and passed to `target` as a read-only
+            keyword argument of the same name. Segments are released
+            when all tasks have finished.
+        cpu_slot_size (optional): If provided, each child process is
+            pinned to a disjoint slot of `cpu_slot_size` cores and
+            BLAS/OpenMP thread counts are set to match. See
+            `cpu_slots` and `pin_cpu_slot`.
+        cpu_id_list (optional): A list of eligable CPU core IDs used
+            to build the CPU slots. By default, all cores available to
+            the current process are used.
 
     Raises:
         Exception
 
     """
-    if n_concurrent is None:
-        n_concurrent = len(cuda_id_list)
-    else:
-        n_concurrent = min([n_concurrent, len(cuda_id_list)])
+    if cuda_id_list is None and cpu_slot_size is None:
+        raise ValueError(
+            'At least one of `cuda_id_list` or `cpu_slot_size` must be '
+            'provided.'
+        )
+
+    cpu_slot_list = None
+    if cpu_slot_size is not None:
+        cpu_slot_list = cpu_slots(cpu_slot_size, cpu_id_list=cpu_id_list)
+
+    n_max = []
+    if cuda_id_list is not None:
+        n_max.append(len(cuda_id_list))
+    if cpu_slot_list is not None:
+        n_max.append(len(cpu_slot_list))
+    if n_concurrent is not None:
+        n_max.append(n_concurrent)
+    n_concurrent = min(n_max)
+
+    if shared_data is None:
+        shared_data = {}
 
+    shm_list = []
+    try:
+        shared_handles = {}
+        for k, v in shared_data.items():
+            shm, handle = share_array(v)
+            shm_list.append(shm)
+            shared_handles[k] = handle
+
+        _run_tasks(
+            target, args_list, cuda_id_list, cpu_slot_list, n_concurrent,
+            shared_handles
+        )
+    finally:
+        for shm in shm_list:
+            shm.close()
+            shm.unlink()
+
+
+def _run_tasks(
+        target, args_list, cuda_id_list, cpu_slot_list, n_concurrent,
+        shared_handles):
+    """Run all tasks, one child process per task."""
     shared_exception = multiprocessing.Queue()
 
     n_task = len(args_list)
 
     args_queue = multiprocessing.Queue()
     for args in args_list:
-        args_queue.put(args)
+        args_queue.put({**shared_handles, **args})
 
     # Use a semaphore to make one child process per CUDA ID.
     # NOTE: Using a pool of workers may not work with TF because it
     # re-uses existing processes, which may not release the GPU's memory.
     sema = multiprocessing.BoundedSemaphore(n_concurrent)
 
-    # Use manager to share list of available CUDA IDs among child processes.
+    # Use manager to share list of available CUDA IDs and CPU slots among
+    # child processes.
     with multiprocessing.Manager() as manager:
-        available_cuda = manager.list(cuda_id_list)
+        available_cuda = None
+        if cuda_id_list is not None:
+            available_cuda = manager.list(cuda_id_list)
+        available_cpu = None
+        if cpu_slot_list is not None:
+            available_cpu = manager.list(cpu_slot_list)
 
         process_list = []
         for _ in range(n_task):
@@ -64,16 +304,17 @@ def cuda_manager(target, args_list, cuda_id_list, n_concurrent=None):
                     target=cuda_child,
                     args=(
                         target, args_queue, available_cuda, shared_exception,
-                        sema
+                        sema, available_cpu
                     )
                 )
             )
 
-        for p in process_list:
-            p.start()
+        with profiling.timer('multicuda.dispatch', n_row=n_task):
+            for p in process_list:
+                p.start()
 
-        for p in process_list:
-            p.join()
+            for p in process_list:
+                p.join()
 
     #  Check for raised exceptions.
     e_list = [shared_exception.get() for _ in process_list]
@@ -82,7 +323,9 @@ def cuda_manager(target, args_list, cuda_id_list, n_concurrent=None):
             raise e
 
 
-def cuda_child(target, args_queue, available_cuda, shared_exception, sema):
+def cuda_child(
+        target, args_queue, available_cuda, shared_exception, sema,
+        available_cpu=None):
     """Create child process of the CUDA manager.
 
     Arguments:
@@ -90,24 +333,56 @@ def cuda_child(target, args_queue, available_cuda, shared_exception, sema):
         args_queue: A multiprocessing.Queue that yields a dictionary
             for consumption by `target`.
         available_cuda: A multiprocessing.Manager.list object for
-            tracking CUDA device availablility.
+            tracking CUDA device availablility. If `None`, no CUDA
+            device is assigned.
         shared_exception: A multiprocessing.Queue for exception
             handling.
         sema: A multiprocessing.BoundedSemaphore object ensuring there
             are never more processes than eligable CUDA devices.
+        available_cpu (optional): A multiprocessing.Manager.list object
+            for tracking CPU slot availability. If `None`, the process
+            is not pinned.
 
     """
     try:
         sema.acquire()
         args = args_queue.get()
-        cuda_id = available_cuda.pop()
 
-        os.environ["CUDA_VISIBLE_DEVICES"] = "{0}".format(cuda_id)
+        cuda_id = None
+        if available_cuda is not None:
+            cuda_id = available_cuda.pop()
+            os.environ["CUDA_VISIBLE_DEVICES"] = "{0}".format(cuda_id)
+
+        cpu_slot = None
+        if available_cpu is not None:
+            cpu_slot = available_cpu.pop()
+            pin_cpu_slot(cpu_slot)
+
+        # Map any shared arrays as zero-copy views.
+        shm_list = []
+        for k, v in args.items():
+            if isinstance(v, SharedArray):
+                shm, args[k] = v.attach()
+                shm_list.append(shm)
+
+        with profiling.timer('multicuda.task'):
+            target(**args)
 
-        target(**args)
+        # Release views before detaching from shared memory.
+        del args
+        for shm in shm_list:
+            try:
+                shm.close()
+            except BufferError:
+                # The target kept a reference to a view; the mapping is
+                # released when the process exits.
+                pass
 
         shared_exception.put(None)
-        available_cuda.append(cuda_id)
+        if cuda_id is not None:
+            available_cuda.append(cuda_id)
+        if cpu_slot is not None:
+            available_cpu.append(cpu_slot)
         sema.release()
 
     except Exception as e:
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Brett D. Roads. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+"""Profiling module.
+
+Lightweight instrumentation of the tidy_models hot paths. Instrumented
+functions emit one event per call to every registered sink. Each event
+is a dictionary with the keys 'name', 'wall_s', 'n_row', 'pid' and
+'time'. When profiling is disabled (the default), instrumentation
+reduces to a single Boolean check.
+
+Example:
+    sink = profiling.MemorySink()
+    with profiling.profile(sink):
+        df = db.load_db(fp)
+    print(sink.summary())
+
+Classes:
+    MemorySink: Aggregate events in memory.
+    JSONLinesSink: Append events to a JSON lines file.
+    Timer: Context manager that times a block of code.
+
+Functions:
+    enable: Enable profiling.
+    disable: Disable profiling.
+    is_enabled: Return whether profiling is enabled.
+    profile: Context manager that enables profiling.
+    timer: Return a timer for a block of code.
+    timed: Decorator that times a function.
+    record: Emit an event.
+    rows_of_result: Return the length of a function's result.
+    rows_of_first_arg: Return the length of a function's first
+        argument.
+
+"""
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+_enabled = False
+_sink_list = []
+
+
+class MemorySink(object):
+    """Aggregate events in memory.
+
+    Methods:
+        summary: Return aggregate statistics per event name.
+        clear: Remove all aggregated events.
+
+    """
+
+    def __init__(self):
+        """Initialize."""
+        super(MemorySink, self).__init__()
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def __call__(self, event):
+        """Aggregate an event."""
+        with self._lock:
+            stats = self._stats.setdefault(
+                event['name'], {'n_call': 0, 'wall_s': 0., 'n_row': 0}
+            )
+            stats['n_call'] += 1
+            stats['wall_s'] += event['wall_s']
+            if event['n_row'] is not None:
+                stats['n_row'] += event['n_row']
+
+    def summary(self):
+        """Return aggregate statistics per event name.
+
+        Returns:
+            stats: A dictionary mapping event names to dictionaries
+                with the keys 'n_call', 'wall_s' and 'n_row'.
+
+        """
+        with self._lock:
+            return {k: dict(v) for k, v in self._stats.items()}
+
+    def clear(self):
+        """Remove all aggregated events."""
+        with self._lock:
+            self._stats = {}
+
+
+class JSONLinesSink(object):
+    """Append events to a JSON lines file.
+
+    Each event is written with a single append, so the file can be
+    shared by several processes (e.g., `multicuda` children).
+
+    Attributes:
+        fp: Filepath of the JSON lines file.
+
+    """
+
+    def __init__(self, fp):
+        """Initialize.
+
+        Arguments:
+            fp: Filepath of the JSON lines file.
+
+        """
+        super(JSONLinesSink, self).__init__()
+        self.fp = os.fspath(fp)
+
+    def __call__(self, event):
+        """Append an event."""
+        line = json.dumps(event) + '\n'
+        with open(self.fp, 'a') as f:
+            f.write(line)
+
+
+class Timer(object):
+    """Context manager that times a block of code.
+
+    Attributes:
+        name: The event name.
+        n_row: The number of rows touched. Can be set inside the
+            block.
+
+    """
+
+    def __init__(self, name, n_row=None):
+        """Initialize.
+
+        Arguments:
+            name: The event name.
+            n_row (optional): The number of rows touched.
+
+        """
+        super(Timer, self).__init__()
+        self.name = name
+        self.n_row = n_row
+        self._t0 = None
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            record(self.name, time.perf_counter() - self._t0, self.n_row)
+        return False
+
+
+class _NullTimer(object):
+    """Timer used when profiling is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def __setattr__(self, name, value):
+        # Ignore `n_row` updates.
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def enable(*sinks):
+    """Enable profiling.
+
+    Arguments:
+        sinks: Sinks that receive events. A sink is any callable that
+            takes an event dictionary, e.g., a MemorySink, a
+            JSONLinesSink or a user function.
+
+    """
+    global _enabled
+    _sink_list.extend(sinks)
+    _enabled = True
+
+
+def disable():
+    """Disable profiling and remove all sinks."""
+    global _enabled
+    _enabled = False
+    del _sink_list[:]
+
+
+def is_enabled():
+    """Return whether profiling is enabled."""
+    return _enabled
+
+
+@contextlib.contextmanager
+def profile(*sinks):
+    """Context manager that enables profiling.
+
+    The previous profiling state is restored on exit.
+
+    Arguments:
+        sinks: See `enable`.
+
+    """
+    global _enabled
+    enabled_prev = _enabled
+    sink_list_prev = list(_sink_list)
+    enable(*sinks)
+    try:
+        yield
+    finally:
+        _sink_list[:] = sink_list_prev
+        _enabled = enabled_prev
+
+
+def timer(name, n_row=None):
+    """Return a timer for a block of code.
+
+    Arguments:
+        name: The event name.
+        n_row (optional): The number of rows touched.
+
+    Returns:
+        timer: A context manager. If profiling is disabled, a shared
+            no-op context manager is returned.
+
+    """
+    if not _enabled:
+        return _NULL_TIMER
+    return Timer(name, n_row=n_row)
+
+
+def timed(name, rows=None):
+    """Decorator that times a function.
+
+    Arguments:
+        name: The event name.
+        rows (optional): A function with signature
+            `rows(result, args, kwargs)` that returns the number of rows
+            touched by a call.
+
+    Returns:
+        decorator: A function decorator.
+
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            result = fn(*args, **kwargs)
+            wall_s = time.perf_counter() - t0
+            n_row = None
+            if rows is not None:
+                n_row = rows(result, args, kwargs)
+            record(name, wall_s, n_row)
+            return result
+        return wrapper
+    return decorator
+
+
+def record(name, wall_s=0., n_row=None):
+    """Emit an event.
+
+    Can also be used as a counter by emitting events without a wall
+    time.
+
+    Arguments:
+        name: The event name.
+        wall_s (optional): The wall time in seconds.
+        n_row (optional): The number of rows touched.
+
+    """
+    if not _enabled:
+        return
+    event = {
+        'name': name,
+        'wall_s': wall_s,
+        'n_row': None if n_row is None else int(n_row),
+        'pid': os.getpid(),
+        'time': time.time(),
+    }
+    for sink in _sink_list:
+        sink(event)
+
+
+def rows_of_result(result, args, kwargs):
+    """Return the length of a function's result."""
+    return len(result)
+
+
+def rows_of_first_arg(result, args, kwargs):
+    """Return the length of a function's first argument."""
+    if len(args) > 0:
+        return len(args[0])
+    return None
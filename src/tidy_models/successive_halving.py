@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Brett D. Roads. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+"""Successive-halving scheduler module.
+
+Functions:
+    rung_resources: Determine the resource budget of each rung.
+    successive_halving: Run a successive-halving sweep over
+        ModelIdentifiers.
+
+"""
+
+import logging
+import math
+import os
+
+import pandas as pd
+
+import tidy_models.databases.pandas.core as db
+from tidy_models import multicuda
+
+logger = logging.getLogger(__name__)
+
+
+def rung_resources(min_resource, max_resource, reduction_factor=3):
+    """Determine the resource budget of each rung.
+
+    Arguments:
+        min_resource: The resource budget of the first rung.
+        max_resource: The resource budget of the last rung.
+        reduction_factor (optional): The factor by which the budget
+            grows (and the number of configurations shrinks) between
+            rungs.
+
+    Returns:
+        resource_list: A list of increasing resource budgets ending in
+            `max_resource`.
+
+    Raises:
+        ValueError if the arguments do not describe a valid schedule.
+
+    """
+    if min_resource <= 0 or max_resource < min_resource:
+        raise ValueError(
+            'Requires `0 < min_resource <= max_resource`.'
+        )
+    if reduction_factor <= 1:
+        raise ValueError('Requires `reduction_factor > 1`.')
+
+    resource_list = []
+    r = min_resource
+    while r < max_resource:
+        resource_list.append(r)
+        r = r * reduction_factor
+    resource_list.append(max_resource)
+    return resource_list
+
+
+def successive_halving(
+        target, mid_list, fp_db, cuda_id_list, monitor_key='loss_val',
+        select_mode='min', resource_key='n_epoch', min_resource=1,
+        max_resource=27, reduction_factor=3, args_fn=None,
+        **manager_kwargs):
+    """Run a successive-halving sweep over ModelIdentifiers.
+
+    All configurations are first evaluated with a budget of
+    `min_resource`. After each rung, the intermediate metrics are read
+    from the fit database and only the top `1 / reduction_factor`
+    fraction of configurations is promoted to the next rung, where
+    the budget is multiplied by `reduction_factor`. The last rung uses
+    a budget of `max_resource`. Configurations without a recorded
+    `monitor_key` are never promoted, so fewer configurations may be
+    promoted and the sweep stops early if none reported results.
+
+    Tasks are dispatched with `multicuda.cuda_manager`, one rung at a
+    time. ModelIdentifiers that differ only in `split` are treated as
+    the same configuration and their metrics are averaged before
+    ranking.
+
+    Each call to `target` is expected to record its results in the fit
+    database located at `fp_db`, using the ModelIdentifier's
+    identifiers plus `resource_key` set to the received budget. Since
+    tasks run concurrently, `target` is responsible for serializing its
+    writes to `fp_db`.
+
+    Arguments:
+        target: A target function to be evaluated.
+        mid_list: A list of ModelIdentifier objects.
+        fp_db: Filepath of the fit database.
+        cuda_id_list: A list of eligable CUDA IDs. See
+            `multicuda.cuda_manager`.
+        monitor_key (optional): The column of the fit database on
+            which configurations are ranked.
+        select_mode (optional): Can be 'min' or 'max'.
+        resource_key (optional): The name of the resource budget. It
+            is used as the keyword argument passed to `target` and as
+            the fit database column identifying intermediate results.
+        min_resource (optional): The budget of the first rung.
+        max_resource (optional): The budget of the last rung.
+        reduction_factor (optional): The factor by which the number of
+            configurations shrinks between rungs.
+        args_fn (optional): A function with signature
+            `args_fn(mid, resource)` returning the dictionary of
+            arguments for `target`. By default, `target` receives
+            `id_data=mid.as_dict()` and `resource_key=resource`.
+        manager_kwargs (optional): Additional keyword arguments passed
+            to `multicuda.cuda_manager`.
+
+    Returns:
+        df_history: A pd.DataFrame with one row per configuration and
+            rung, recording the budget, the (split-averaged) monitored
+            metric, and whether the configuration was promoted.
+
+    Raises:
+        ValueError if `select_mode` is not recognized.
+
+    """
+    if select_mode not in ['min', 'max']:
+        raise ValueError('Unrecognized `select_mode`.')
+
+    if args_fn is None:
+        def args_fn(mid, resource):
+            return {'id_data': mid.as_dict(), resource_key: resource}
+
+    resource_list = rung_resources(
+        min_resource, max_resource, reduction_factor=reduction_factor
+    )
+
+    # Group ModelIdentifiers into configurations that only differ by
+    # split.
+    config_dict = {}
+    for mid in mid_list:
+        config_dict.setdefault(_config_key(mid), []).append(mid)
+    active_list = list(config_dict.keys())
+
+    history = []
+    for rung, resource in enumerate(resource_list):
+        logger.info(
+            'Rung %d: evaluating %d configuration(s) with %s=%s.',
+            rung, len(active_list), resource_key, resource
+        )
+        args_list = []
+        for config in active_list:
+            for mid in config_dict[config]:
+                args_list.append(args_fn(mid, resource))
+        multicuda.cuda_manager(
+            target, args_list, cuda_id_list, **manager_kwargs
+        )
+
+        # Collect intermediate metrics from the fit database.
+        score_list = _rung_scores(
+            fp_db, active_list, config_dict, monitor_key, resource_key,
+            resource
+        )
+
+        # Rank configurations, placing missing results last.
+        sign = 1 if select_mode == 'min' else -1
+        order = sorted(
+            range(len(active_list)),
+            key=lambda i: (
+                math.isnan(score_list[i]),
+                sign * score_list[i] if not math.isnan(score_list[i]) else 0
+            )
+        )
+        is_last = rung == len(resource_list) - 1
+        # Configurations without results are never promoted.
+        n_scored = sum(not math.isnan(score) for score in score_list)
+        if is_last:
+            n_promote = 0
+        else:
+            n_promote = min(
+                max(1, len(active_list) // reduction_factor), n_scored
+            )
+            if n_scored < len(active_list):
+                logger.warning(
+                    'Rung %d: stopping %d configuration(s) without `%s`.',
+                    rung, len(active_list) - n_scored, monitor_key
+                )
+        promote_set = set(order[0:n_promote])
+
+        for i, config in enumerate(active_list):
+            promoted = i in promote_set
+            history.append({
+                'rung': rung,
+                resource_key: resource,
+                **dict(config),
+                monitor_key: score_list[i],
+                'promoted': promoted,
+            })
+            if math.isnan(score_list[i]):
+                logger.warning(
+                    'Rung %d: no `%s` found for %s.',
+                    rung, monitor_key, dict(config)
+                )
+            logger.info(
+                'Rung %d: %s %s=%s -> %s.',
+                rung, dict(config), monitor_key, score_list[i],
+                'promote' if promoted else 'stop'
+            )
+
+        active_list = [active_list[i] for i in order[0:n_promote]]
+        if not is_last and len(active_list) == 0:
+            logger.warning(
+                'Rung %d: no configuration has `%s`, stopping the sweep.',
+                rung, monitor_key
+            )
+            break
+
+    df_history = pd.DataFrame(history)
+    return df_history
+
+
+def _config_key(mid):
+    """Return a hashable configuration key that ignores `split`."""
+    d = mid.as_dict()
+    d.pop('split')
+    return tuple(sorted(d.items()))
+
+
+def _rung_scores(
+        fp_db, active_list, config_dict, monitor_key, resource_key,
+        resource):
+    """Return the split-averaged metric of each active configuration."""
+    score_list = [float('nan')] * len(active_list)
+    if not os.path.exists(fp_db):
+        return score_list
+
+    df_fit = db.load_db(fp_db)
+    if monitor_key not in df_fit.columns or \
+            resource_key not in df_fit.columns:
+        return score_list
+
+    for i, config in enumerate(active_list):
+        value_list = []
+        for mid in config_dict[config]:
+            id_data = {**mid.as_dict(), resource_key: resource}
+            if not set(id_data.keys()).issubset(df_fit.columns):
+                continue
+            df_match = db.find(df_fit, id_data)
+            if len(df_match) > 0:
+                # Use most recent entry if there are duplicates.
+                value_list.append(float(df_match[monitor_key].iloc[-1]))
+        if len(value_list) > 0:
+            score_list[i] = sum(value_list) / len(value_list)
+    return score_list
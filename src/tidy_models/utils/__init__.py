@@ -15,12 +15,16 @@
 # ============================================================================
 """Utils module."""
 
+from tidy_models.utils.collapse_select_groups import collapse_select_groups
 from tidy_models.utils.collapse_splits import collapse_splits
 from tidy_models.utils.identify_hypers import identify_hypers
 from tidy_models.utils.select_hypers import select_hypers
+from tidy_models.utils.select_pareto import select_pareto
 
 __all__ = [
+    'collapse_select_groups',
     'collapse_splits',
     'identify_hypers',
     'select_hypers',
+    'select_pareto',
 ]
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Brett D. Roads. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+"""Selection module.
+
+Functions:
+    collapse_select_groups: Collapse splits and select hyperparameters
+        for every group of comparable models.
+
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from tidy_models.utils.collapse_splits import collapse_splits
+from tidy_models.utils.select_hypers import select_hypers
+
+
+def collapse_select_groups(
+        df_fit, group_keys=['arch_id', 'input_id'], monitor_key='val_loss',
+        select_mode='min', mode='balanced', n_worker=None):
+    """Collapse splits and select hyperparameters for every group.
+
+    The fit database is partitioned by `group_keys` and each group is
+    processed with `collapse_splits` followed by `select_hypers`.
+    Groups are distributed across a pool of worker processes. Each
+    worker only receives the rows of its own groups, so the full
+    DataFrame is never pickled per task. Groups without any split data
+    (e.g., only full-data fits with `split=-1`) cannot be collapsed, so
+    they are skipped with a warning.
+
+    Arguments:
+        df_fit: A pd.DataFrame with model fit data.
+        group_keys (optional): The columns that identify a group of
+            comparable models.
+        monitor_key (optional): See `select_hypers`.
+        select_mode (optional): See `select_hypers`.
+        mode (optional): See `collapse_splits`.
+        n_worker (optional): The number of worker processes. By
+            default, uses the number of CPUs. If `1`, groups are
+            processed in the current process.
+
+    Returns:
+        df_fit_collapse: The collapsed data of all groups.
+        df_fit_best: The best row of each group.
+
+        Both are ordered by `group_keys`, independent of `n_worker`.
+
+    """
+    if n_worker is None:
+        n_worker = os.cpu_count()
+
+    group_list = []
+    skip_list = []
+    for values, df_group in df_fit.groupby(
+            group_keys, sort=True, observed=True):
+        id_data = dict(zip(group_keys, _as_tuple(values)))
+        if np.any(df_group['split'].to_numpy() != -1):
+            group_list.append((id_data, df_group))
+        else:
+            skip_list.append(id_data)
+    if len(skip_list) > 0:
+        warnings.warn(
+            'Skipped {0} group(s) without split data: {1}'.format(
+                len(skip_list), skip_list
+            )
+        )
+    kwargs = {
+        'monitor_key': monitor_key,
+        'select_mode': select_mode,
+        'mode': mode,
+    }
+
+    if n_worker == 1 or len(group_list) <= 1:
+        result_list = _collapse_select_chunk(group_list, **kwargs)
+    else:
+        # Use a few chunks per worker to balance load while keeping the
+        # per-task overhead low.
+        n_chunk = min(len(group_list), 4 * n_worker)
+        chunk_list = [group_list[i::n_chunk] for i in range(n_chunk)]
+        with ProcessPoolExecutor(max_workers=n_worker) as executor:
+            future_list = [
+                executor.submit(_collapse_select_chunk, chunk, **kwargs)
+                for chunk in chunk_list
+            ]
+            result_list = [None] * len(group_list)
+            for i, future in enumerate(future_list):
+                result_list[i::n_chunk] = future.result()
+
+    if len(result_list) == 0:
+        return pd.DataFrame(), pd.DataFrame()
+
+    df_fit_collapse = pd.concat(
+        [r[0] for r in result_list], ignore_index=True
+    )
+    df_fit_best = pd.concat([r[1] for r in result_list], ignore_index=True)
+    return df_fit_collapse, df_fit_best
+
+
+def _collapse_select_chunk(group_list, monitor_key, select_mode, mode):
+    """Collapse and select a list of `(id_data, df_group)` groups."""
+    result_list = []
+    for id_data, df_group in group_list:
+        df_fit_collapse = collapse_splits(df_group, id_data, mode=mode)
+        df_fit_best = select_hypers(
+            df_fit_collapse, id_data, monitor_key=monitor_key,
+            select_mode=select_mode
+        )
+        result_list.append((df_fit_collapse, df_fit_best))
+    return result_list
+
+
+def _as_tuple(values):
+    """Return group values as a tuple."""
+    if isinstance(values, tuple):
+        return values
+    return (values,)
@@ -24,10 +24,14 @@ Functions:
 import numpy as np
 import pandas as pd
 
+from tidy_models import profiling
 import tidy_models.databases.pandas.core as db
+from tidy_models.databases.pandas.query import In
+from tidy_models.databases.pandas.query import Not
 from tidy_models.utils.identify_hypers import identify_hypers
 
 
+@profiling.timed('collapse_splits', rows=profiling.rows_of_first_arg)
 def collapse_splits(df_fit, id_data, mode='balanced'):
     """Collapse data across different splits.
 
@@ -54,7 +58,7 @@ def collapse_splits(df_fit, id_data, mode='balanced'):
     df_fit = db.find(df_fit, id_data)
 
     # Remove split '-1` from analysis.
-    df_fit = df_fit.query('split != -1')
+    df_fit = db.find(df_fit, {'split': Not(-1)})
 
     if len(df_fit) == 0:
         raise ValueError(
@@ -62,13 +66,10 @@ def collapse_splits(df_fit, id_data, mode='balanced'):
         )
 
     id_keys = list(id_data.keys())
+    hypers = identify_hypers(df_fit)
     if mode == 'balanced':
         # Filter data so that splits are balanced across dimensions.
-
-        # First, determine the hyperparameters.
-        hypers = identify_hypers(df_fit)
-
-        # Second, determine the intersection of splits across all hyper-
+        # Determine the intersection of splits across all hyper-
         # parameter settings.
         for hyper in hypers:
             hyper_arr = pd.unique(df_fit[hyper])
@@ -82,21 +83,18 @@ def collapse_splits(df_fit, id_data, mode='balanced'):
                 )
 
         # Drop rows that are not in the intersection.
-        bidx_keep = None
-        for split in split_intersect:
-            if bidx_keep is None:
-                bidx_keep = df_fit['split'] == split
-            else:
-                bidx_keep = bidx_keep | (df_fit['split'] == split)
-        df_fit = df_fit[bidx_keep]
+        df_fit = db.find(df_fit, {'split': In(split_intersect)})
 
     # Exploit multi-index functionality to collapse across splits.
+    # NOTE: Use `observed=True` so that categorical identifiers do not
+    # produce empty groups.
     stat_column_list = id_keys + hypers
-    df_count = df_fit.groupby(stat_column_list).size().to_frame('count')
-    df_mean = df_fit.groupby(stat_column_list).mean()
+    grouped = df_fit.groupby(stat_column_list, observed=True)
+    df_count = grouped.size().to_frame('count')
+    df_mean = grouped.mean()
     # Adjust std error computation based on global mean of split. TODO
     # df_global_mean = df_fit.groupby(id_keys).mean()
-    df_std = df_fit.groupby(stat_column_list).std().add_suffix('_std')
+    df_std = grouped.std().add_suffix('_std')
     df_fit_collapse = pd.concat([df_count, df_mean, df_std], axis=1)
 
     # Drop unneeded columns.
@@ -23,10 +23,12 @@ Functions:
 import numpy as np
 import pandas as pd
 
+from tidy_models import profiling
 import tidy_models.databases.pandas.core as db
 from tidy_models.utils.identify_hypers import identify_hypers
 
 
+@profiling.timed('select_hypers', rows=profiling.rows_of_first_arg)
 def select_hypers(
         df_fit_collapse, id_data, monitor_key='val_loss', select_mode='min'):
     """Select hyperparameters for a set of comparable models.
@@ -70,17 +72,17 @@ def select_hypers(
     # Select best row.
     if select_mode == 'min':
         # best_row = np.argmin(df_fit_collapse[monitor_key].values)
-        best_idx = df_fit_collapse[monitor_key].idxmin(axis='columns')
+        best_idx = df_fit_collapse[monitor_key].idxmin()
     elif select_mode == 'max':
-        best_idx = df_fit_collapse[monitor_key].idxmax(axis='columns')
+        best_idx = df_fit_collapse[monitor_key].idxmax()
     else:
         raise ValueError('Unrecognized `select_mode`.')
-    df_fit_best = df_fit_collapse.iloc[[best_idx], :].copy()
+    df_fit_best = df_fit_collapse.loc[[best_idx], :].copy()
 
     # Add min/max hyperparameter information.
     hypers = identify_hypers(df_fit_collapse)
     for hyper in hypers:
-        hyper_arr = df_fit_collapse[hyper].values
+        hyper_arr = df_fit_collapse[hyper].to_numpy()
         hyper_min = np.min(hyper_arr)
         hyper_max = np.max(hyper_arr)
         df_fit_best[hyper + '_min'] = hyper_min
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Brett D. Roads. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+"""Selection module.
+
+Functions:
+    select_pareto: Select the Pareto front of hyperparameters over
+        multiple monitor keys.
+    pareto_rank: Rank points by non-dominated front.
+
+"""
+
+import bisect
+
+import numpy as np
+
+from tidy_models import profiling
+import tidy_models.databases.pandas.core as db
+from tidy_models.utils.identify_hypers import identify_hypers
+
+FRONT_KEY = 'pareto_front'
+
+
+@profiling.timed('select_pareto', rows=profiling.rows_of_first_arg)
+def select_pareto(
+        df_fit_collapse, id_data, monitor_keys, select_modes='min',
+        n_front=1):
+    """Select the Pareto front of hyperparameters over monitor keys.
+
+    Requires that all provided models use the same architecture
+    (`arch_id`) and input data (`input_id`).
+
+    Arguments:
+        df_fit_collapse: A pd.DataFrame containing collapsed fit
+            information.
+        id_data: A dictionary specifying the model to select hyper-
+            parameters. At a minimum this is should include 'arch_id'
+            and 'input_id'.
+        monitor_keys: A list of keys that are traded off against each
+            other, e.g., `['loss_val', 'train_time_s']`.
+        select_modes (optional): Either 'min' or 'max', or a list with
+            one mode per monitor key.
+        n_front (optional): The number of ranked fronts to return. If
+            `None`, all fronts are returned.
+
+    Returns:
+        df_fit_pareto: The rows belonging to the first `n_front`
+            fronts, with an added column `FRONT_KEY` holding the front
+            rank (starting at 1). Rows are sorted by front and then by
+            `monitor_keys`.
+
+    Raises:
+        ValueError if there is no data for the requested `id_data` or
+            if `select_modes` is not recognized.
+
+    """
+    monitor_keys = list(monitor_keys)
+    if isinstance(select_modes, str):
+        select_modes = [select_modes] * len(monitor_keys)
+    if len(select_modes) != len(monitor_keys):
+        raise ValueError(
+            'Requires one `select_modes` entry per monitor key.'
+        )
+    sign = []
+    for select_mode in select_modes:
+        if select_mode == 'min':
+            sign.append(1.)
+        elif select_mode == 'max':
+            sign.append(-1.)
+        else:
+            raise ValueError('Unrecognized `select_mode`.')
+
+    # Make sure that all models have the same architecture and input by
+    # select relevant rows for analysis.
+    df_fit_collapse = db.find(df_fit_collapse, id_data)
+
+    if len(df_fit_collapse) == 0:
+        raise ValueError(
+            'There is no data for the requested `id_data`.'
+        )
+
+    # Convert all objectives to minimization.
+    values = df_fit_collapse[monitor_keys].to_numpy(dtype=float)
+    values = values * np.asarray(sign)
+    rank = pareto_rank(values, n_front=n_front)
+
+    df_fit_pareto = df_fit_collapse.copy()
+    df_fit_pareto[FRONT_KEY] = rank
+    df_fit_pareto = df_fit_pareto[rank > 0]
+    df_fit_pareto = df_fit_pareto.sort_values(
+        [FRONT_KEY] + monitor_keys,
+        ascending=[True] + [s > 0 for s in sign],
+        kind='stable'
+    )
+
+    # Add min/max hyperparameter information.
+    hypers = identify_hypers(df_fit_collapse)
+    for hyper in hypers:
+        hyper_arr = df_fit_collapse[hyper].to_numpy()
+        df_fit_pareto[hyper + '_min'] = np.min(hyper_arr)
+        df_fit_pareto[hyper + '_max'] = np.max(hyper_arr)
+
+    return df_fit_pareto
+
+
+def pareto_rank(values, n_front=None):
+    """Rank points by non-dominated front.
+
+    All objectives are minimized. A point dominates another point if it
+    is no worse in every objective and strictly better in at least one.
+    Identical points share a front and missing values are treated as
+    the worst possible value.
+
+    Uses a sort-based algorithm: points are sorted lexicographically,
+    so a point can only be dominated by points preceding it, and each
+    point is placed by a binary search over the fronts found so far.
+    With a single objective, fronts are the sorted unique values. With
+    two objectives, each step is O(log n), otherwise each step
+    checks dominance against one front at a time in a vectorized
+    manner.
+
+    Arguments:
+        values: A 2D array-like with shape (n_point, n_objective).
+        n_front (optional): The number of fronts to rank. Points beyond
+            `n_front` receive rank 0. If `None`, all points are ranked.
+
+    Returns:
+        rank: An integer np.ndarray with shape (n_point,) holding the
+            front of each point, starting at 1.
+
+    """
+    values = np.array(values, dtype=float, ndmin=2)
+    values[np.isnan(values)] = np.inf
+    n_point = values.shape[0]
+    if n_front is None:
+        n_front = n_point
+    rank = np.zeros(n_point, dtype=int)
+    if n_point == 0 or n_front < 1:
+        return rank
+
+    # Identical points share a front, so only rank unique points.
+    values_unique, inverse = np.unique(values, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    # NOTE: `np.unique` returns points sorted lexicographically.
+    if values_unique.shape[1] == 1:
+        # Every unique value is its own front.
+        rank_unique = np.arange(1, len(values_unique) + 1)
+        rank_unique[rank_unique > n_front] = 0
+    elif values_unique.shape[1] == 2:
+        rank_unique = _rank_2d(values_unique, n_front)
+    else:
+        rank_unique = _rank_nd(values_unique, n_front)
+    rank = rank_unique[inverse]
+    return rank
+
+
+def _rank_2d(values, n_front):
+    """Rank unique, lexicographically sorted 2D points."""
+    rank = np.zeros(len(values), dtype=int)
+    # The last point added to each front has the front's smallest second
+    # objective. These minima increase with the front rank.
+    front_min = []
+    for i, y in enumerate(values[:, 1].tolist()):
+        # A point is dominated by a front iff the front's minimum is not
+        # larger than `y`.
+        k = bisect.bisect_right(front_min, y)
+        if k == len(front_min):
+            if k == n_front:
+                continue
+            front_min.append(y)
+        else:
+            front_min[k] = y
+        rank[i] = k + 1
+    return rank
+
+
+def _rank_nd(values, n_front):
+    """Rank unique, lexicographically sorted points."""
+    rank = np.zeros(len(values), dtype=int)
+    # Preceding points are never worse in the first objective, so only
+    # the remaining objectives need to be compared. Members of each
+    # front are stored objective-major in an array that grows as needed.
+    values_rest = values[:, 1:]
+    n_rest = values_rest.shape[1]
+    front_arr = []
+    front_count = []
+    for i in range(len(values)):
+        x = values_rest[i]
+        # Binary search for the first front that does not dominate `x`.
+        # If a front dominates `x`, so do all earlier fronts.
+        lo = 0
+        hi = len(front_arr)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            members = front_arr[mid][:, 0:front_count[mid]]
+            # Preceding unique points dominate `x` if they are no worse
+            # in every objective.
+            dominated = members[0] <= x[0]
+            for j in range(1, n_rest):
+                dominated &= members[j] <= x[j]
+            if dominated.any():
+                lo = mid + 1
+            else:
+                hi = mid
+        k = lo
+        if k == len(front_arr):
+            if k == n_front:
+                continue
+            front_arr.append(np.empty([n_rest, 16]))
+            front_count.append(0)
+        if front_count[k] == front_arr[k].shape[1]:
+            front_arr[k] = np.concatenate(
+                [front_arr[k], np.empty_like(front_arr[k])], axis=1
+            )
+        front_arr[k][:, front_count[k]] = x
+        front_count[k] += 1
+        rank[i] = k + 1
+    return rank
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Brett D. Roads. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+"""Test collapse_select_groups."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tidy_models.utils import collapse_select_groups
+from tidy_models.utils import collapse_splits
+from tidy_models.utils import select_hypers
+
+
+@pytest.fixture
+def df_fit():
+    """Fit database with several architectures and inputs."""
+    rng = np.random.RandomState(252)
+    rows = []
+    for arch_id in range(4):
+        for input_id in range(3):
+            for n_dim in [2, 3, 4]:
+                for split in range(-1, 3):
+                    rows.append({
+                        'arch_id': arch_id,
+                        'input_id': input_id,
+                        'split': split,
+                        'hyp_n_dim': n_dim,
+                        'loss_val': rng.rand(),
+                    })
+    # Shuffle rows to make sure output order does not depend on input.
+    df = pd.DataFrame(rows).sample(frac=1, random_state=0)
+    return df
+
+
+@pytest.mark.parametrize("n_worker", [1, 3])
+def test_collapse_select_groups(df_fit, n_worker):
+    """Test that results match a sequential loop over groups."""
+    df_collapse, df_best = collapse_select_groups(
+        df_fit, monitor_key='loss_val', n_worker=n_worker
+    )
+
+    collapse_list = []
+    best_list = []
+    for arch_id in range(4):
+        for input_id in range(3):
+            id_data = {'arch_id': arch_id, 'input_id': input_id}
+            df_c = collapse_splits(df_fit, id_data)
+            collapse_list.append(df_c)
+            best_list.append(
+                select_hypers(df_c, id_data, monitor_key='loss_val')
+            )
+    desired_collapse = pd.concat(collapse_list, ignore_index=True)
+    desired_best = pd.concat(best_list, ignore_index=True)
+
+    pd.testing.assert_frame_equal(df_collapse, desired_collapse)
+    pd.testing.assert_frame_equal(df_best, desired_best)
+    assert len(df_best) == 12
+
+
+def test_skip_groups_without_splits(df_fit):
+    """Test that groups with only full-data fits are skipped."""
+    df_full = pd.DataFrame({
+        'arch_id': [9, 9],
+        'input_id': [0, 0],
+        'split': [-1, -1],
+        'hyp_n_dim': [2, 3],
+        'loss_val': [.1, .2],
+    })
+    df_fit = pd.concat([df_fit, df_full], ignore_index=True)
+    with pytest.warns(UserWarning, match='arch_id'):
+        df_collapse, df_best = collapse_select_groups(
+            df_fit, monitor_key='loss_val', n_worker=1
+        )
+    assert len(df_best) == 12
+    assert 9 not in df_collapse['arch_id'].tolist()
@@ -0,0 +1,400 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Brett D. Roads. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+"""Test databases module."""
+
+import multiprocessing
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import tidy_models.databases.pandas.core as db
+from tidy_models.databases.writer import append_result
+from tidy_models.databases.writer import STAGING_SUFFIX
+from tidy_models.model_identifier import ModelIdentifier
+from tidy_models.utils import collapse_splits
+from tidy_models.utils import select_hypers
+
+
+@pytest.fixture
+def fp_db_fit(tmpdir):
+    """Fit database with two hyperparameters and three splits."""
+    fp = os.fspath(tmpdir.join('db_fit.txt'))
+    db.create_empty_db(
+        fp,
+        columns=['arch_id', 'input_id', 'split_seed', 'n_split', 'split'],
+        metric_dtype='float32'
+    )
+    df = db.load_db(fp)
+    for n_dim in [2, 3]:
+        for opt in ['adam', 'sgd']:
+            for split in [0, 1, 2]:
+                mid = ModelIdentifier(
+                    hypers={'n_dim': n_dim, 'opt': opt}, split=split
+                )
+                assoc_data = {
+                    'n_epoch': 10 * n_dim,
+                    'loss_val': n_dim + split / 10. + (opt == 'sgd'),
+                }
+                df = db.update_one(df, mid.as_dict(), assoc_data)
+    db.save_db(df, fp)
+    return fp
+
+
+def test_schema_roundtrip(fp_db_fit):
+    """Test that `load_db` parses columns into compact dtypes."""
+    schema = db.load_schema(fp_db_fit)
+    assert schema['metric_dtype'] == 'float32'
+
+    df = db.load_db(fp_db_fit)
+    assert len(df) == 12
+    assert df['arch_id'].dtype == 'int8'
+    assert df['split_seed'].dtype == 'int16'
+    assert df['hyp_n_dim'].dtype == 'int8'
+    assert isinstance(df['hyp_opt'].dtype, pd.CategoricalDtype)
+    assert df['loss_val'].dtype == 'float32'
+    # Integer metrics are not converted to `metric_dtype`.
+    assert df['n_epoch'].dtype == 'int64'
+
+    loc = db.is_match(df, {'hyp_opt': 'sgd', 'split': 1, 'hyp_n_dim': 3})
+    assert loc.sum() == 1
+
+
+def test_schema_inferred_without_sidecar(fp_db_fit):
+    """Test that databases without a sidecar still load."""
+    os.remove(fp_db_fit + db.SCHEMA_SUFFIX)
+    df = db.load_db(fp_db_fit)
+    assert df['arch_id'].dtype == 'int64'
+    assert df['hyp_opt'].dtype == 'object'
+
+
+def test_schema_float_hypers(tmpdir):
+    """Test that integral float hyperparameters stay floats."""
+    fp = os.fspath(tmpdir.join('db_fit.txt'))
+    db.create_empty_db(fp)
+    df = db.load_db(fp)
+    for scale in [1., 2., 4.]:
+        mid = ModelIdentifier(hypers={'scale': scale, 'opt': 'x'})
+        df = db.update_one(df, mid.as_dict(), {'loss_val': scale})
+    db.save_db(df, fp)
+
+    df = db.load_db(fp)
+    assert df['hyp_scale'].dtype == 'float64'
+    assert df['split'].dtype == 'int8'
+    df = db.load_db(fp, schema={'dtypes': {}})
+    assert df['hyp_scale'].dtype == 'float64'
+
+    row = df.iloc[0]
+    mid = ModelIdentifier(
+        arch_id=row['arch_id'], input_id=row['input_id'],
+        hypers={'scale': row['hyp_scale'], 'opt': row['hyp_opt']}
+    )
+    assert mid.name == ModelIdentifier(
+        hypers={'scale': 1., 'opt': 'x'}
+    ).name
+
+
+def test_schema_widens_on_update(fp_db_fit):
+    """Test that out-of-range identifiers widen the stored dtype."""
+    df = db.load_db(fp_db_fit)
+    mid = ModelIdentifier(arch_id=1000, hypers={'n_dim': 2, 'opt': 'rms'})
+    df = db.update_one(df, mid.as_dict(), {'loss_val': 1.})
+    db.save_db(df, fp_db_fit)
+
+    df = db.load_db(fp_db_fit)
+    assert df['arch_id'].dtype == 'int16'
+    assert len(db.find(df, {'arch_id': 1000, 'hyp_opt': 'rms'})) == 1
+
+
+def test_collapse_select_compact(fp_db_fit):
+    """Test analysis utilities on a database with compact dtypes."""
+    df = db.load_db(fp_db_fit)
+    id_data = {'arch_id': 0, 'input_id': 0}
+    df_collapse = collapse_splits(df, id_data)
+    assert len(df_collapse) == 4
+    assert df_collapse['count'].tolist() == [3, 3, 3, 3]
+
+    df_best = select_hypers(df_collapse, id_data, monitor_key='loss_val')
+    assert df_best['hyp_n_dim'].iloc[0] == 2
+    assert df_best['hyp_opt'].iloc[0] == 'adam'
+    assert df_best['hyp_opt_max'].iloc[0] == 'sgd'
+
+
+def test_find_many(fp_db_fit):
+    """Test batch lookup of identifiers."""
+    df = db.load_db(fp_db_fit)
+    id_list = [
+        ModelIdentifier(hypers={'n_dim': 3, 'opt': 'sgd'}, split=1).as_dict(),
+        ModelIdentifier(hypers={'n_dim': 4, 'opt': 'sgd'}, split=1).as_dict(),
+        ModelIdentifier(hypers={'n_dim': 2, 'opt': 'adam'}, split=0).as_dict(),
+    ]
+    # Add a duplicate row.
+    df = pd.concat([df, db.find(df, id_list[2])], ignore_index=True)
+
+    df_match = db.find_many(df, id_list)
+
+    assert df_match[db.INPUT_KEY].tolist() == [0, 1, 2, 2]
+    assert df_match[db.STATUS_KEY].tolist() == [
+        'found', 'missing', 'duplicate', 'duplicate'
+    ]
+    assert df_match['loss_val'].iloc[0] == pytest.approx(4.1)
+    assert pd.isna(df_match['loss_val'].iloc[1])
+    assert df_match[db.ROW_KEY].iloc[3] == len(df) - 1
+
+    # Results agree with one `find` per identifier.
+    for i, id_data in enumerate(id_list):
+        df_find = db.find(df, id_data)
+        df_i = df_match[df_match[db.INPUT_KEY] == i]
+        assert len(df_find) == df_i[db.ROW_KEY].count()
+
+    with pytest.raises(ValueError):
+        db.find_many(df, [{'arch_id': 0}, {'input_id': 0}])
+
+    # No identifiers.
+    df_match = db.find_many(df, [])
+    assert len(df_match) == 0
+    for col in [db.INPUT_KEY, db.ROW_KEY, db.STATUS_KEY]:
+        assert col in df_match.columns
+
+    # Unknown keys raise like `find`.
+    with pytest.raises(KeyError):
+        db.find(df, {'hyp_missing': 0})
+    with pytest.raises(KeyError):
+        db.find_many(df, [{'hyp_missing': 0}])
+
+    # Missing values never match, like `find`.
+    df['hyp_lr'] = np.nan
+    id_nan = {'hyp_n_dim': 2, 'hyp_lr': np.nan}
+    assert len(db.find(df, id_nan)) == 0
+    df_match = db.find_many(df, [id_nan])
+    assert df_match[db.STATUS_KEY].tolist() == ['missing']
+    df_match = db.find_many(df, [{'hyp_n_dim': np.nan}, {'hyp_n_dim': 3}])
+    assert df_match[db.STATUS_KEY].tolist()[0] == 'missing'
+    assert df_match[db.INPUT_KEY].tolist() == [0] + [1] * 6
+
+    # Database columns must not collide with the added columns.
+    df[db.STATUS_KEY] = 'done'
+    with pytest.raises(ValueError):
+        db.find_many(df, id_list)
+
+
+def test_update_one_duplicate_warning(fp_db_fit):
+    """Test that updating duplicated identifiers warns."""
+    df = db.load_db(fp_db_fit)
+    df = pd.concat([df, df.iloc[[0]]], ignore_index=True)
+    id_data = {'arch_id': 0, 'split': 0, 'hyp_n_dim': 2, 'hyp_opt': 'adam'}
+    with pytest.warns(UserWarning):
+        db.update_one(df, id_data, {'loss_val': 0.})
+
+
+def append_worker(fp, worker_id, n_record):
+    """Append results from a separate process."""
+    for i in range(n_record):
+        mid = ModelIdentifier(
+            arch_id=1, hypers={'n_dim': worker_id, 'opt': 'adam'}, split=i
+        )
+        append_result(fp, mid.as_dict(), {'loss_val': worker_id + i / 10.})
+
+
+def test_append_result_merge(fp_db_fit):
+    """Test that staged results are merged by `load_db`."""
+    df_before = db.load_db(fp_db_fit)
+
+    mid = ModelIdentifier(hypers={'n_dim': 3, 'opt': 'sgd'}, split=1)
+    append_result(fp_db_fit, mid.as_dict(), {'loss_val': -1., 'n_epoch': 5})
+    append_result(fp_db_fit, mid.as_dict(), {'loss_val': -2.})
+    mid_new = ModelIdentifier(hypers={'n_dim': 9, 'opt': 'sgd'}, split=0)
+    append_result(fp_db_fit, mid_new.as_dict(), {'loss_val': 9.})
+    # Simulate a write in progress.
+    with open(fp_db_fit + STAGING_SUFFIX, 'a') as f:
+        f.write('{"id": {"arch_')
+
+    df = db.load_db(fp_db_fit)
+    assert len(df) == len(df_before) + 1
+    df_match = db.find(df, mid.as_dict())
+    assert df_match['loss_val'].tolist() == [-2.]
+    assert df_match['n_epoch'].tolist() == [5]
+    assert db.find(df, mid_new.as_dict())['loss_val'].tolist() == [9.]
+
+    # Loading without merging ignores staged results.
+    assert len(db.load_db(fp_db_fit, merge_staged=False)) == len(df_before)
+
+
+def test_save_db_after_staged(fp_db_fit):
+    """Test that saved updates are not reverted by staged results."""
+    id_data = ModelIdentifier(
+        hypers={'n_dim': 3, 'opt': 'sgd'}, split=1
+    ).as_dict()
+    id_late = ModelIdentifier(
+        hypers={'n_dim': 3, 'opt': 'sgd'}, split=0
+    ).as_dict()
+    append_result(fp_db_fit, id_data, {'loss_val': 1.})
+
+    df = db.load_db(fp_db_fit)
+    df = db.update_one(df, id_data, {'loss_val': 2.})
+    # A result staged after loading is not part of `df`.
+    append_result(fp_db_fit, id_late, {'loss_val': 3.})
+    db.save_db(df, fp_db_fit)
+
+    df = db.load_db(fp_db_fit, merge_staged=False)
+    assert db.find(df, id_data)['loss_val'].tolist() == [2.]
+    df = db.load_db(fp_db_fit)
+    assert db.find(df, id_data)['loss_val'].tolist() == [2.]
+    assert db.find(df, id_late)['loss_val'].tolist() == [3.]
+
+    # Saving again folds the remaining staged result.
+    db.save_db(df, fp_db_fit)
+    assert os.path.getsize(fp_db_fit + STAGING_SUFFIX) == 0
+    df = db.load_db(fp_db_fit, merge_staged=False)
+    assert db.find(df, id_late)['loss_val'].tolist() == [3.]
+
+
+def test_save_db_after_intervening_load(fp_db_fit):
+    """Test that staged results loaded elsewhere are not discarded."""
+    id_data = ModelIdentifier(
+        hypers={'n_dim': 3, 'opt': 'sgd'}, split=0
+    ).as_dict()
+    id_late = ModelIdentifier(
+        hypers={'n_dim': 3, 'opt': 'sgd'}, split=1
+    ).as_dict()
+    append_result(fp_db_fit, id_data, {'loss_val': 1.})
+    df = db.load_db(fp_db_fit)
+
+    # A worker stages another result, which other code in the same
+    # process loads before the older frame is saved.
+    append_result(fp_db_fit, id_late, {'loss_val': 3.})
+    df_other = db.load_db(fp_db_fit)
+    assert db.find(df_other, id_late)['loss_val'].tolist() == [3.]
+    db.load_db(fp_db_fit, merge_staged=False)
+
+    df = db.update_one(df, id_data, {'loss_val': 2.})
+    db.save_db(df, fp_db_fit)
+
+    df = db.load_db(fp_db_fit)
+    assert db.find(df, id_data)['loss_val'].tolist() == [2.]
+    assert db.find(df, id_late)['loss_val'].tolist() == [3.]
+
+    # Frames that were not loaded with staged results keep them staged.
+    df = db.load_db(fp_db_fit, merge_staged=False)
+    db.save_db(df, fp_db_fit)
+    df = db.load_db(fp_db_fit)
+    assert db.find(df, id_late)['loss_val'].tolist() == [3.]
+
+
+def test_append_result_concurrent(tmpdir):
+    """Test concurrent appends and compaction."""
+    fp = os.fspath(tmpdir.join('db_fit.txt'))
+    db.create_empty_db(fp)
+
+    n_worker = 4
+    n_record = 25
+    process_list = [
+        multiprocessing.Process(target=append_worker, args=(fp, i, n_record))
+        for i in range(n_worker)
+    ]
+    for p in process_list:
+        p.start()
+    for p in process_list:
+        p.join()
+
+    df = db.load_db(fp)
+    assert len(df) == n_worker * n_record
+
+    db.compact_db(fp)
+    assert os.path.getsize(fp + STAGING_SUFFIX) == 0
+    df_compact = db.load_db(fp)
+    assert len(df_compact) == n_worker * n_record
+    df_match = db.find(df_compact, {'hyp_n_dim': 2, 'split': 3})
+    assert df_match['loss_val'].tolist() == [pytest.approx(2.3)]
+
+
+def test_load_db_cache(fp_db_fit, monkeypatch):
+    """Test that unchanged databases are served from the cache."""
+    db.clear_cache()
+    n_read = []
+    read_db = db._read_db
+
+    def spy(*args):
+        n_read.append(1)
+        return read_db(*args)
+
+    monkeypatch.setattr(db, '_read_db', spy)
+
+    df_0 = db.load_db(fp_db_fit)
+    df_1 = db.load_db(fp_db_fit)
+    assert len(n_read) == 1
+    pd.testing.assert_frame_equal(df_0, df_1)
+
+    # Modifying a returned frame does not corrupt the cache.
+    df_1.loc[0, 'loss_val'] = -99.
+    df_2 = db.load_db(fp_db_fit)
+    assert len(n_read) == 1
+    pd.testing.assert_frame_equal(df_0, df_2)
+
+    # Saving or staging results triggers a reload.
+    db.save_db(df_1, fp_db_fit)
+    df_3 = db.load_db(fp_db_fit)
+    assert len(n_read) == 2
+    assert df_3.loc[0, 'loss_val'] == -99.
+
+    append_result(fp_db_fit, {'arch_id': 7}, {'loss_val': 1.})
+    df_4 = db.load_db(fp_db_fit)
+    assert len(n_read) == 3
+    assert len(df_4) == len(df_3) + 1
+
+    db.load_db(fp_db_fit, cache=False)
+    assert len(n_read) == 4
+
+
+def test_save_db_atomic(fp_db_fit):
+    """Test that saving replaces the file without leftovers."""
+    os.chmod(fp_db_fit, 0o640)
+    df = db.load_db(fp_db_fit)
+    db.save_db(df, fp_db_fit)
+
+    assert os.stat(fp_db_fit).st_mode & 0o777 == 0o640
+    dp = os.path.dirname(fp_db_fit)
+    assert sorted(os.listdir(dp)) == [
+        'db_fit.txt', 'db_fit.txt' + db.SCHEMA_SUFFIX
+    ]
+
+    # New files are created with the process umask applied to 0666.
+    umask = os.umask(0o027)
+    try:
+        fp_new = os.path.join(dp, 'db_new.txt')
+        db.save_db(df, fp_new)
+        assert os.umask(0o027) == 0o027
+    finally:
+        os.umask(umask)
+    assert os.stat(fp_new).st_mode & 0o777 == 0o640
+
+
+def test_schema_stale_for_data(fp_db_fit, tmpdir):
+    """Test that a schema is not applied to data it was not saved with."""
+    df = db.load_db(fp_db_fit)
+    mid = ModelIdentifier(arch_id=1000, hypers={'n_dim': 2, 'opt': 'rms'})
+    df_wide = db.update_one(df, mid.as_dict(), {'loss_val': 1.})
+    fp_wide = os.fspath(tmpdir.join('db_wide.txt'))
+    db.save_db(df_wide, fp_wide)
+
+    # Simulate a reader that sees the narrow schema of `fp_db_fit` with
+    # the data of an older, wider database.
+    shutil.copyfile(fp_wide, fp_db_fit)
+    assert db.load_schema(fp_db_fit)['dtypes']['arch_id'] == 'int8'
+    df = db.load_db(fp_db_fit)
+    assert len(db.find(df, {'arch_id': 1000})) == 1
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Brett D. Roads. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+"""Test import-time behavior."""
+
+import os
+from pathlib import Path
+import subprocess
+import sys
+
+import tidy_models
+
+HEAVY_MODULES = ['pandas', 'numpy']
+
+
+def import_time(statement):
+    """Import modules in a fresh interpreter using `-X importtime`.
+
+    Arguments:
+        statement: Python source executed in the fresh interpreter.
+
+    Returns:
+        time_dict: A dictionary mapping each imported top-level
+            package to its cumulative import time in microseconds.
+
+    """
+    env = dict(os.environ)
+    src_dir = os.fspath(Path(tidy_models.__file__).parent.parent)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [src_dir] + [p for p in [env.get('PYTHONPATH')] if p]
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        env=env, stderr=subprocess.PIPE, check=True,
+        universal_newlines=True
+    )
+
+    # Lines look like "import time: self [us] | cumulative | package".
+    time_dict = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        try:
+            cumulative = int(parts[1])
+        except ValueError:
+            # Header line.
+            continue
+        name = parts[2].strip().split('.')[0]
+        time_dict[name] = max(time_dict.get(name, 0), cumulative)
+    return time_dict
+
+
+def test_import_is_light():
+    """Test that importing the package does not load heavy modules."""
+    time_dict = import_time(
+        'import tidy_models; import tidy_models.multicuda; '
+        'import tidy_models.databases; '
+        'from tidy_models.databases import append_result'
+    )
+    assert 'tidy_models' in time_dict
+    for name in HEAVY_MODULES:
+        assert name not in time_dict, (
+            '`{0}` imported eagerly; tidy_models took {1} us.'.format(
+                name, time_dict['tidy_models']
+            )
+        )
+
+
+def test_lazy_attributes():
+    """Test that lazy submodules and functions resolve on access."""
+    time_dict = import_time(
+        'import tidy_models as tm; tm.utils.collapse_splits; '
+        'tm.databases.load_db'
+    )
+    assert 'pandas' in time_dict
+
+    assert callable(tidy_models.databases.load_db)
+    assert callable(tidy_models.utils.select_hypers)
+    assert 'multicuda' in dir(tidy_models)
@@ -20,6 +20,10 @@ import os
 import re
 import time
 
+from multiprocessing import shared_memory
+import numpy as np
+import pytest
+
 from tidy_models import multicuda
 
 # os.environ["CUDA_DEVICE_ORDER"] = "PCI_BUS_ID"
@@ -42,6 +46,17 @@ def dummy_target(id=None, path=None):
     f.close()
 
 
+def shared_target(id=None, path=None, x=None, y=None):
+    """Target function that receives shared arrays."""
+    fn = path.join('test-{0}.txt'.format(id))
+    f = open(fn, 'w')
+    f.write("id={0}\n".format(id))
+    f.write("x_sum={0}\n".format(int(np.sum(x))))
+    f.write("y_sum={0}\n".format(int(np.sum(y))))
+    f.write("writeable={0}\n".format(x.flags.writeable))
+    f.close()
+
+
 def test_0(tmpdir):
     """Test multi-process CUDA.
 
@@ -95,3 +110,101 @@ def test_0(tmpdir):
 
     # Assert that 8 processes completed.
     assert desired_counter == counter
+
+
+def test_shared_data(tmpdir):
+    """Test passing shared arrays to multi-process CUDA tasks."""
+    cuda_id_list = [0, 1]
+    x = np.arange(1000, dtype=np.int64).reshape(10, 100)
+    shm_y, y = multicuda.share_array(np.ones([7], dtype=np.float32))
+
+    args_list = [
+        {'id': str(i), 'path': tmpdir, 'y': y} for i in range(4)
+    ]
+
+    try:
+        multicuda.cuda_manager(
+            shared_target, args_list, cuda_id_list, shared_data={'x': x}
+        )
+    finally:
+        shm_y.close()
+        shm_y.unlink()
+
+    for i in range(4):
+        f = open(tmpdir.join('test-{0}.txt'.format(i)), 'r')
+        lines = [ln.rstrip().split('=')[1] for ln in f.readlines()]
+        f.close()
+        assert lines[0] == str(i)
+        assert int(lines[1]) == int(np.sum(x))
+        assert int(lines[2]) == 7
+        assert lines[3] == 'False'
+
+
+def test_share_array_attach():
+    """Test round trip of an array through shared memory."""
+    x = np.random.RandomState(0).rand(3, 4)
+    shm, handle = multicuda.share_array(x)
+    try:
+        shm_view, x_view = handle.attach()
+        np.testing.assert_array_equal(x, x_view)
+        assert not x_view.flags.writeable
+        del x_view
+        shm_view.close()
+    finally:
+        shm.close()
+        shm.unlink()
+
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=handle.name)
+
+
+def cpu_target(id=None, path=None):
+    """Target function that reports CPU pinning."""
+    fn = path.join('test-{0}.txt'.format(id))
+    f = open(fn, 'w')
+    f.write("id={0}\n".format(id))
+    f.write("affinity={0}\n".format(
+        ','.join(str(c) for c in sorted(os.sched_getaffinity(0)))
+    ))
+    f.write("omp={0}\n".format(os.getenv('OMP_NUM_THREADS')))
+    f.write("cuda_visible_ids={0}\n".format(
+        os.getenv('CUDA_VISIBLE_DEVICES')
+    ))
+    f.close()
+
+
+def test_cpu_slots():
+    """Test partitioning of cores into slots."""
+    slot_list = multicuda.cpu_slots(2, cpu_id_list=[0, 1, 2, 3, 4])
+    assert slot_list == [(0, 1), (2, 3)]
+
+    with pytest.raises(ValueError):
+        multicuda.cpu_slots(3, cpu_id_list=[0, 1])
+
+
+@pytest.mark.parametrize("use_cuda", [False, True])
+def test_cpu_slot_mode(tmpdir, use_cuda):
+    """Test CPU-slot scheduling, optionally combined with CUDA IDs."""
+    cpu_id_list = sorted(os.sched_getaffinity(0))
+    slot_list = multicuda.cpu_slots(1, cpu_id_list=cpu_id_list)
+
+    cuda_id_list = None
+    if use_cuda:
+        cuda_id_list = [5, 6]
+
+    n_task = 5
+    args_list = [{'id': str(i), 'path': tmpdir} for i in range(n_task)]
+    multicuda.cuda_manager(
+        cpu_target, args_list, cuda_id_list, cpu_slot_size=1,
+        cpu_id_list=cpu_id_list
+    )
+
+    for i in range(n_task):
+        f = open(tmpdir.join('test-{0}.txt'.format(i)), 'r')
+        lines = [ln.rstrip().split('=')[1] for ln in f.readlines()]
+        f.close()
+        affinity = tuple(int(c) for c in lines[1].split(','))
+        assert affinity in slot_list
+        assert lines[2] == '1'
+        if use_cuda:
+            assert lines[3] in ['5', '6']
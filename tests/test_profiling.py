@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Brett D. Roads. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+"""Test profiling module."""
+
+import json
+import os
+
+import pandas as pd
+
+from tidy_models import multicuda
+from tidy_models import profiling
+import tidy_models.databases.pandas.core as db
+from tidy_models.utils import collapse_splits
+from tidy_models.utils import select_hypers
+
+
+def noop_target(id=None):
+    """Target function that does nothing."""
+    pass
+
+
+def make_df_fit():
+    """Return a small fit database."""
+    rows = []
+    for n_dim in [2, 3]:
+        for split in [0, 1]:
+            rows.append({
+                'arch_id': 0, 'input_id': 0, 'split': split,
+                'hyp_n_dim': n_dim, 'loss_val': n_dim + split,
+            })
+    return pd.DataFrame(rows)
+
+
+def test_memory_sink(tmpdir):
+    """Test call counts and rows touched of instrumented functions."""
+    fp = os.fspath(tmpdir.join('db_fit.txt'))
+    df = make_df_fit()
+    id_data = {'arch_id': 0, 'input_id': 0}
+
+    sink = profiling.MemorySink()
+    with profiling.profile(sink):
+        db.save_db(df, fp)
+        df = db.load_db(fp)
+        df = db.update_one(df, {**id_data, 'split': 2, 'hyp_n_dim': 2}, {})
+        df_collapse = collapse_splits(df, id_data)
+        select_hypers(df_collapse, id_data, monitor_key='loss_val')
+    assert not profiling.is_enabled()
+
+    stats = sink.summary()
+    assert stats['save_db'] == {
+        'n_call': 1, 'wall_s': stats['save_db']['wall_s'], 'n_row': 4
+    }
+    assert stats['load_db']['n_row'] == 4
+    assert stats['update_one']['n_row'] == 4
+    assert stats['collapse_splits']['n_row'] == 5
+    assert stats['select_hypers']['n_row'] == 2
+    assert stats['is_match']['n_call'] >= 3
+    for v in stats.values():
+        assert v['wall_s'] >= 0.
+
+    # Nothing is recorded while disabled.
+    sink.clear()
+    db.load_db(fp)
+    assert sink.summary() == {}
+
+
+def test_jsonl_and_callback_sinks(tmpdir):
+    """Test JSON lines and callback sinks, including multicuda events."""
+    fp = os.fspath(tmpdir.join('profile.jsonl'))
+    event_list = []
+    with profiling.profile(profiling.JSONLinesSink(fp), event_list.append):
+        multicuda.cuda_manager(
+            noop_target, [{'id': i} for i in range(3)], [0, 1]
+        )
+        with profiling.timer('custom') as t:
+            t.n_row = 7
+        profiling.record('counter', n_row=1)
+
+    name_list = [e['name'] for e in event_list]
+    assert name_list == ['multicuda.dispatch', 'custom', 'counter']
+    assert event_list[0]['n_row'] == 3
+    assert event_list[1]['n_row'] == 7
+
+    # Child processes append task events to the shared file.
+    with open(fp, 'r') as f:
+        file_list = [json.loads(line)['name'] for line in f]
+    assert file_list.count('multicuda.task') == 3
+    assert file_list.count('multicuda.dispatch') == 1
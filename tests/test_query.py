@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Brett D. Roads. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+"""Test query module."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import tidy_models.databases.pandas.core as db
+from tidy_models.databases.pandas.query import Eq
+from tidy_models.databases.pandas.query import In
+from tidy_models.databases.pandas.query import Not
+from tidy_models.databases.pandas.query import QueryIndex
+from tidy_models.databases.pandas.query import Range
+
+
+@pytest.fixture
+def df_fit():
+    """Fit database with a categorical hyperparameter."""
+    rng = np.random.RandomState(252)
+    n_row = 500
+    df = pd.DataFrame({
+        'arch_id': rng.randint(0, 5, n_row),
+        'split': rng.randint(-1, 4, n_row),
+        'hyp_lr': rng.choice([.0001, .001, .01, .1], n_row),
+        'hyp_opt': pd.Categorical(rng.choice(['adam', 'sgd'], n_row)),
+        'loss_val': rng.rand(n_row),
+    })
+    # Shuffle index labels to make sure masks are aligned by position.
+    df.index = rng.permutation(n_row) + 1000
+    return df
+
+
+def test_predicates(df_fit):
+    """Test each predicate against the equivalent pandas expression."""
+    loc = db.is_match(df_fit, {'arch_id': In([0, 3]), 'split': Not(-1)})
+    desired = df_fit['arch_id'].isin([0, 3]) & (df_fit['split'] != -1)
+    pd.testing.assert_series_equal(loc, desired, check_names=False)
+
+    loc = db.is_match(df_fit, {'hyp_lr': Range(.001, .01)})
+    desired = df_fit['hyp_lr'].between(.001, .01)
+    pd.testing.assert_series_equal(loc, desired, check_names=False)
+
+    loc = db.is_match(
+        df_fit, {'hyp_lr': Range(.001, .01, inclusive='neither')}
+    )
+    assert loc.sum() == 0
+
+    loc = db.is_match(df_fit, {'hyp_opt': 'sgd', 'split': Eq(2)})
+    desired = (df_fit['hyp_opt'] == 'sgd') & (df_fit['split'] == 2)
+    pd.testing.assert_series_equal(loc, desired, check_names=False)
+
+    loc = db.is_match(df_fit, {'hyp_opt': Not(In(['adam', 'rms']))})
+    desired = df_fit['hyp_opt'] == 'sgd'
+    pd.testing.assert_series_equal(loc, desired, check_names=False)
+
+    loc = db.is_match(df_fit, {'hyp_opt': 'rms'})
+    assert loc.sum() == 0
+
+    with pytest.raises(ValueError):
+        Range(0, 1, inclusive='all')
+
+
+def test_index(df_fit):
+    """Test that indexed lookups match full scans."""
+    index = QueryIndex(df_fit, ['arch_id', 'split', 'hyp_opt'])
+    query_list = [
+        {'arch_id': 2},
+        {'arch_id': In([1, 4]), 'split': Not(-1)},
+        {'arch_id': 3, 'split': Range(0, 2), 'hyp_lr': .01},
+        {'hyp_opt': 'adam', 'arch_id': Range(high=1)},
+        {'split': Range(1, 2, inclusive='right'), 'hyp_opt': In(['x'])},
+        {'arch_id': 99},
+    ]
+    for query in query_list:
+        df_scan = db.find(df_fit, query)
+        df_index = db.find(df_fit, query, index=index)
+        pd.testing.assert_frame_equal(df_scan, df_index)
+
+    # An index must be rebuilt when the DataFrame changes.
+    with pytest.raises(ValueError):
+        db.find(df_fit.iloc[1:], {'arch_id': 2}, index=index)
+    with pytest.raises(ValueError):
+        db.find(df_fit.sort_values('split'), {'arch_id': 2}, index=index)
+
+
+def test_index_repeated_values():
+    """Test that repeated `In` values do not duplicate candidates."""
+    df = pd.DataFrame({'a': [0, 1, 1, 2, 2, 0], 'b': [1, 1, 2, 2, 1, 1]})
+    index = QueryIndex(df, ['a', 'b'])
+    query_list = [
+        {'a': In([1, 1]), 'b': 1},
+        {'a': In([1, 1]), 'b': In([1, 1])},
+        {'a': In([2, 0, 2])},
+    ]
+    for query in query_list:
+        df_scan = db.find(df, query)
+        df_index = db.find(df, query, index=index)
+        pd.testing.assert_frame_equal(df_scan, df_index)
+    assert list(db.find(df, query_list[1], index=index).index) == [1]
+
+
+def test_empty():
+    """Test that empty databases never match."""
+    df = pd.DataFrame(columns=['arch_id', 'input_id'])
+    df_match = db.find(df, {'arch_id': 0, 'hyp_n_dim': In([1, 2])})
+    assert len(df_match) == 0
+    assert list(df_match.columns) == ['arch_id', 'input_id']
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Brett D. Roads. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+"""Test Pareto selection."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tidy_models.utils import select_pareto
+from tidy_models.utils.select_pareto import FRONT_KEY
+from tidy_models.utils.select_pareto import pareto_rank
+
+
+def brute_force_rank(values):
+    """Rank fronts by repeatedly peeling off non-dominated points."""
+    values = np.array(values, dtype=float)
+    values[np.isnan(values)] = np.inf
+    rank = np.zeros(len(values), dtype=int)
+    front = 0
+    while np.any(rank == 0):
+        front += 1
+        remaining = np.flatnonzero(rank == 0)
+        for i in remaining:
+            dominated = False
+            for j in remaining:
+                if np.all(values[j] <= values[i]) and \
+                        np.any(values[j] < values[i]):
+                    dominated = True
+                    break
+            if not dominated:
+                rank[i] = -front
+        rank[rank < 0] = front
+    return rank
+
+
+@pytest.mark.parametrize("n_objective", [1, 2, 3, 4])
+def test_pareto_rank(n_objective):
+    """Test ranks against a brute-force implementation."""
+    rng = np.random.RandomState(n_objective)
+    # Use a coarse grid to create ties and duplicate points.
+    values = rng.randint(0, 6, size=[200, n_objective]).astype(float)
+    values[3, 0] = np.nan
+
+    desired = brute_force_rank(values)
+    np.testing.assert_array_equal(pareto_rank(values), desired)
+
+    # Only rank the first two fronts.
+    rank = pareto_rank(values, n_front=2)
+    np.testing.assert_array_equal(rank, np.where(desired <= 2, desired, 0))
+
+
+def test_select_pareto():
+    """Test selection with mixed min/max directions."""
+    df = pd.DataFrame({
+        'arch_id': [0, 0, 0, 0, 0, 1],
+        'input_id': [0, 0, 0, 0, 0, 0],
+        'hyp_n_dim': [1, 2, 3, 4, 5, 6],
+        'loss_val': [.5, .4, .3, .4, .6, .0],
+        'accuracy': [.7, .8, .6, .7, .9, 1.],
+    })
+    id_data = {'arch_id': 0, 'input_id': 0}
+
+    df_pareto = select_pareto(
+        df, id_data, ['loss_val', 'accuracy'], select_modes=['min', 'max']
+    )
+    assert df_pareto['hyp_n_dim'].tolist() == [3, 2, 5]
+    assert df_pareto[FRONT_KEY].tolist() == [1, 1, 1]
+    assert df_pareto['hyp_n_dim_min'].tolist() == [1, 1, 1]
+    assert df_pareto['hyp_n_dim_max'].tolist() == [5, 5, 5]
+
+    df_pareto = select_pareto(
+        df, id_data, ['loss_val', 'accuracy'], select_modes=['min', 'max'],
+        n_front=None
+    )
+    assert df_pareto['hyp_n_dim'].tolist() == [3, 2, 5, 4, 1]
+    assert df_pareto[FRONT_KEY].tolist() == [1, 1, 1, 2, 3]
+
+    # A single monitor key ranks by value and ties share a front.
+    df_pareto = select_pareto(df, id_data, ['loss_val'], n_front=3)
+    assert df_pareto['hyp_n_dim'].tolist() == [3, 2, 4, 1]
+    assert df_pareto[FRONT_KEY].tolist() == [1, 2, 2, 3]
+
+    with pytest.raises(ValueError):
+        select_pareto(df, id_data, ['loss_val'], select_modes=['min', 'x'])
+    with pytest.raises(ValueError):
+        select_pareto(df, {'arch_id': 2}, ['loss_val', 'accuracy'])
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Brett D. Roads. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+"""Test sharded database module."""
+
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import tidy_models.databases.pandas.core as db
+from tidy_models.databases.pandas.query import In
+from tidy_models.databases.pandas.sharded import create_sharded_db
+from tidy_models.databases.pandas.sharded import load_sharded_db
+from tidy_models.databases.pandas.sharded import save_sharded_db
+from tidy_models.databases.pandas.sharded import update_one_sharded
+from tidy_models.databases.pandas.sharded import _shard_name
+
+
+@pytest.fixture
+def df_fit():
+    """Fit database spanning several architectures and inputs."""
+    rows = []
+    for arch_id in range(3):
+        for input_id in range(2):
+            for split in range(4):
+                rows.append({
+                    'arch_id': arch_id,
+                    'input_id': input_id,
+                    'split': split,
+                    'loss_val': arch_id + input_id / 10. + split / 100.,
+                })
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture
+def dp_db(tmpdir, df_fit):
+    """Sharded fit database."""
+    dp = os.fspath(tmpdir.join('db_fit'))
+    create_sharded_db(dp, keys=['arch_id', 'input_id'])
+    save_sharded_db(df_fit, dp)
+    return dp
+
+
+def test_roundtrip(dp_db, df_fit):
+    """Test that a full load returns all rows."""
+    shard_list = [fn for fn in os.listdir(dp_db) if fn.endswith('.txt')]
+    assert len(shard_list) == 6
+
+    df = load_sharded_db(dp_db, n_worker=3)
+    pd.testing.assert_frame_equal(
+        df.sort_values(['arch_id', 'input_id', 'split']).reset_index(
+            drop=True
+        ),
+        df_fit,
+        check_dtype=False
+    )
+
+
+def test_select_shards(dp_db, df_fit, monkeypatch):
+    """Test that only selected shards are read."""
+    fp_read = []
+    load_db = db.load_db
+
+    def spy(fp, **kwargs):
+        fp_read.append(fp)
+        return load_db(fp, **kwargs)
+
+    monkeypatch.setattr(db, 'load_db', spy)
+
+    df = load_sharded_db(dp_db, {'arch_id': 1, 'input_id': 0})
+    assert len(fp_read) == 1
+    np.testing.assert_array_equal(df['split'], [0, 1, 2, 3])
+
+    fp_read.clear()
+    df = load_sharded_db(dp_db, {'arch_id': In([0, 2]), 'split': 3})
+    assert len(fp_read) == 4
+    assert len(df) == 4
+
+
+def test_update_one_sharded(dp_db, monkeypatch):
+    """Test that updates only rewrite the affected shard."""
+    fp_write = []
+    save_db = db.save_db
+
+    def spy(df, fp, **kwargs):
+        fp_write.append(fp)
+        return save_db(df, fp, **kwargs)
+
+    monkeypatch.setattr(db, 'save_db', spy)
+
+    update_one_sharded(
+        dp_db, {'arch_id': 2, 'input_id': 1, 'split': 0}, {'loss_val': -1.}
+    )
+    update_one_sharded(
+        dp_db, {'arch_id': 5, 'input_id': 0, 'split': 0}, {'loss_val': 5.}
+    )
+    assert len(fp_write) == 2
+    assert os.path.basename(fp_write[1]) == _shard_name((5, 0))
+
+    df = load_sharded_db(dp_db, {'arch_id': 2, 'input_id': 1, 'split': 0})
+    assert df['loss_val'].tolist() == [-1.]
+    df = load_sharded_db(dp_db, {'arch_id': 5})
+    assert df['loss_val'].tolist() == [5.]
+    assert len(load_sharded_db(dp_db)) == 25
+
+    with pytest.raises(ValueError):
+        update_one_sharded(dp_db, {'arch_id': 2}, {'loss_val': 0.})
+
+
+def test_save_filtered(dp_db):
+    """Test that saving a filtered frame keeps the other shard rows."""
+    df = load_sharded_db(dp_db, {'arch_id': 1, 'split': 0})
+    assert len(df) == 2
+    df['loss_val'] = -1.
+    save_sharded_db(df, dp_db)
+
+    df = load_sharded_db(dp_db, {'arch_id': 1, 'input_id': 0})
+    assert len(df) == 4
+    assert df['loss_val'].tolist() == [-1., 1.01, 1.02, 1.03]
+    assert len(load_sharded_db(dp_db)) == 24
+
+    # Replacing drops rows that are not saved.
+    df = load_sharded_db(dp_db, {'arch_id': 1, 'split': 0})
+    save_sharded_db(df, dp_db, mode='replace')
+    assert len(load_sharded_db(dp_db, {'arch_id': 1})) == 2
+    assert len(load_sharded_db(dp_db)) == 18
+
+
+def update_worker(dp, arch_id, n_row):
+    """Add rows for one architecture from a separate process."""
+    for split in range(n_row):
+        update_one_sharded(
+            dp, {'arch_id': arch_id, 'input_id': 0, 'split': split},
+            {'loss_val': arch_id + split / 10.}
+        )
+
+
+def test_update_concurrent(tmpdir):
+    """Test that processes writing different shards do not interfere."""
+    dp = os.fspath(tmpdir.join('db_fit'))
+    create_sharded_db(dp, keys=['arch_id', 'input_id'])
+
+    n_worker = 8
+    n_row = 5
+    process_list = [
+        multiprocessing.Process(target=update_worker, args=(dp, i, n_row))
+        for i in range(n_worker)
+    ]
+    for p in process_list:
+        p.start()
+    for p in process_list:
+        p.join()
+
+    shard_list = [fn for fn in os.listdir(dp) if fn.endswith('.txt')]
+    assert len(shard_list) == n_worker
+    df = load_sharded_db(dp)
+    assert len(df) == n_worker * n_row
+    df_match = db.find(df, {'arch_id': 7, 'split': 4})
+    assert df_match['loss_val'].tolist() == [pytest.approx(7.4)]
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Brett D. Roads. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+"""Test successive halving."""
+
+import os
+
+import pytest
+
+import tidy_models.databases.pandas.core as db
+from tidy_models.model_identifier import ModelIdentifier
+from tidy_models.successive_halving import rung_resources
+from tidy_models.successive_halving import successive_halving
+
+
+def synthetic_target(id_data=None, n_epoch=None, fp_db=None):
+    """Synthetic objective whose loss is minimized at `n_dim=4`."""
+    id_data = {**id_data, 'n_epoch': n_epoch}
+    assoc_data = {'loss_val': (id_data['hyp_n_dim'] - 4)**2 + 1. / n_epoch}
+    if not os.path.exists(fp_db):
+        db.create_empty_db(fp_db, columns=list(id_data.keys()))
+    df = db.load_db(fp_db)
+    df = db.update_one(df, id_data, assoc_data)
+    db.save_db(df, fp_db)
+
+
+def sparse_target(id_data=None, n_epoch=None, fp_db=None):
+    """Synthetic objective that only reports results for `n_dim < 2`."""
+    if id_data['hyp_n_dim'] < 2:
+        synthetic_target(id_data=id_data, n_epoch=n_epoch, fp_db=fp_db)
+
+
+def test_rung_resources():
+    """Test rung budgets."""
+    assert rung_resources(1, 9, reduction_factor=3) == [1, 3, 9]
+    assert rung_resources(1, 10, reduction_factor=3) == [1, 3, 9, 10]
+    assert rung_resources(5, 5) == [5]
+    with pytest.raises(ValueError):
+        rung_resources(0, 9)
+    with pytest.raises(ValueError):
+        rung_resources(1, 9, reduction_factor=1)
+
+
+def test_successive_halving(tmpdir):
+    """Test successive halving with a synthetic CPU-only objective."""
+    fp_db = os.fspath(tmpdir.join('db_fit.txt'))
+    mid_list = [
+        ModelIdentifier(hypers={'n_dim': n_dim}, split=0)
+        for n_dim in range(9)
+    ]
+
+    df_history = successive_halving(
+        synthetic_target, mid_list, fp_db, [0], monitor_key='loss_val',
+        resource_key='n_epoch', min_resource=1, max_resource=9,
+        reduction_factor=3,
+        args_fn=lambda mid, r: {
+            'id_data': mid.as_dict(), 'n_epoch': r, 'fp_db': fp_db
+        }
+    )
+
+    # Check number of configurations evaluated in each rung.
+    n_per_rung = df_history.groupby('rung').size().tolist()
+    assert n_per_rung == [9, 3, 1]
+
+    # Check the promoted configurations.
+    df_rung0 = df_history[df_history['rung'] == 0]
+    promoted = sorted(df_rung0[df_rung0['promoted']]['hyp_n_dim'].tolist())
+    assert promoted == [3, 4, 5]
+    df_last = df_history[df_history['rung'] == 2]
+    assert df_last['hyp_n_dim'].tolist() == [4]
+    assert df_last['loss_val'].tolist() == pytest.approx([1. / 9])
+
+    # Check that only promoted configurations were trained.
+    df_fit = db.load_db(fp_db)
+    assert len(df_fit) == 9 + 3 + 1
+
+
+def test_successive_halving_missing(tmpdir):
+    """Test that configurations without results are not promoted."""
+    fp_db = os.fspath(tmpdir.join('db_fit.txt'))
+    mid_list = [
+        ModelIdentifier(hypers={'n_dim': n_dim}, split=0)
+        for n_dim in range(9)
+    ]
+
+    def args_fn(mid, r):
+        return {'id_data': mid.as_dict(), 'n_epoch': r, 'fp_db': fp_db}
+
+    df_history = successive_halving(
+        sparse_target, mid_list, fp_db, [0], min_resource=1,
+        max_resource=9, reduction_factor=3, args_fn=args_fn
+    )
+    df_rung0 = df_history[df_history['rung'] == 0]
+    promoted = sorted(df_rung0[df_rung0['promoted']]['hyp_n_dim'].tolist())
+    assert promoted == [0, 1]
+    assert df_history.groupby('rung').size().tolist() == [9, 2, 1]
+
+    # Without any results, the sweep stops after the first rung.
+    fp_db = os.fspath(tmpdir.join('db_fit_empty.txt'))
+    mid_list = [ModelIdentifier(hypers={'n_dim': 5 + i}) for i in range(3)]
+    df_history = successive_halving(
+        sparse_target, mid_list, fp_db, [0], min_resource=1,
+        max_resource=9, reduction_factor=3, args_fn=args_fn
+    )
+    assert df_history['rung'].tolist() == [0, 0, 0]
+    assert not df_history['promoted'].any()